@@ -0,0 +1,537 @@
+"""ASGI entry point for holding many concurrent, slow clients in one process.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The prediction and message routes (``/api/predict``, ``/api/predict/batch`` and
+``/api/messages/*``) are served natively: each request is a coroutine, database
+access goes through an asyncpg pool, and CPU-bound scoring runs on a bounded
+thread pool so the event loop keeps accepting connections while models run.
+Threads rather than processes are used because the prediction cache, the
+near-duplicate index and the models live in this process's memory. Every other
+route, including ``/api/admin/*``, auth and ``/metrics``, is handed to the Flask
+app on its own bounded thread pool, so the API is the same as ``app:app`` under
+gunicorn. Requires the optional ``asyncpg`` package and an ASGI server.
+"""
+import asyncio
+import contextlib
+import functools
+import itertools
+import json
+import logging
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from urllib.parse import parse_qs
+
+try:
+    import asyncpg
+except ImportError:  # only needed when serving through this module
+    asyncpg = None
+
+import app as core
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_RE = re.compile(r'%s')
+
+# One round trip for any number of rows; the columns arrive as parallel arrays
+INSERT_MESSAGES = """
+    INSERT INTO messages (uuid, user_id, content, type, language, is_spam, confidence, spam_indicators, created_at, model_version, campaign_id)
+    SELECT row_uuid, user_id, content, type, language, is_spam, confidence, indicators::jsonb, created_at, model_version, campaign_id
+    FROM unnest($1::uuid[], $2::int[], $3::text[], $4::text[], $5::text[], $6::bool[], $7::float8[], $8::text[], $9::timestamptz[], $10::text[], $11::int[])
+        AS t(row_uuid, user_id, content, type, language, is_spam, confidence, indicators, created_at, model_version, campaign_id)
+    RETURNING uuid, id
+"""
+INSERT_COLUMNS = ('uuid', 'user_id', 'content', 'type', 'language', 'is_spam', 'confidence', 'spam_indicators', 'created_at', 'model_version', 'campaign_id')
+
+@functools.lru_cache(maxsize=256)
+def to_asyncpg(sql):
+    """Rewrite psycopg2 ``%s`` placeholders as asyncpg's ``$1, $2, ...``."""
+    counter = itertools.count(1)
+    return PLACEHOLDER_RE.sub(lambda _: f'${next(counter)}', sql)
+
+async def init_connection(conn):
+    # Decode JSON columns (spam_indicators, EXPLAIN output) the way psycopg2 does
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {name: values[0] for name, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.body = body
+
+    def get_json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+    def arg(self, name, default=None, type=None):
+        """Query parameter with Flask's ``request.args.get`` semantics: bad values fall back to ``default``."""
+        if name not in self.args:
+            return default
+        try:
+            return type(self.args[name]) if type else self.args[name]
+        except ValueError:
+            return default
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+def call_wsgi(wsgi_app, environ):
+    """Run a WSGI app to completion; returns (status, headers, body)."""
+    response = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return chunks.append
+
+    iterable = wsgi_app(environ, start_response)
+    try:
+        chunks.extend(iterable)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    return response['status'], response['headers'], b''.join(chunks)
+
+class AsyncApp:
+    # (method, path pattern, handler name); names match the Flask endpoints so metrics line up
+    ROUTES = [
+        ('POST', re.compile(r'/api/predict'), 'predict_spam'),
+        ('POST', re.compile(r'/api/predict/batch'), 'predict_spam_batch'),
+        ('GET', re.compile(r'/api/messages/history'), 'get_detection_history'),
+        ('GET', re.compile(r'/api/messages/stats'), 'get_detection_stats'),
+        ('GET', re.compile(r'/api/messages/(?P<message_uuid>[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12})'), 'get_message_id'),
+    ]
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.pool = None
+        self.inference_executor = ThreadPoolExecutor(
+            max_workers=core.app.config['ASGI_INFERENCE_WORKERS'], thread_name_prefix='inference'
+        )
+        self.wsgi_executor = ThreadPoolExecutor(
+            max_workers=core.app.config['ASGI_WSGI_THREADS'], thread_name_prefix='wsgi'
+        )
+        self._started = False
+        self._start_lock = None
+        self._pool_lock = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        await self.ensure_started()
+
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        request = Request(scope, body)
+        handler, params = self.match(request)
+        if handler is None:
+            status, headers, payload = await self.run_blocking(self.wsgi_executor, call_wsgi, self.wsgi_app, wsgi_environ(scope, body))
+            await self.send_response(send, status, headers, payload)
+            return
+
+        started = time.perf_counter()
+        try:
+            status, payload, extra_headers = await getattr(self, handler)(request, **params)
+        except Exception as e:
+            logger.error(f"Unhandled error in {handler}: {e}", exc_info=True)
+            status, payload, extra_headers = 500, {'error': 'Internal server error'}, []
+        core.REQUEST_SECONDS.observe(time.perf_counter() - started, handler, request.method, status)
+
+        headers = [(b'content-type', b'application/json')] + self.cors_headers(request) + extra_headers
+        await self.send_response(send, status, headers, json.dumps(payload, sort_keys=True).encode('utf-8'))
+
+    def match(self, request):
+        for method, pattern, handler in self.ROUTES:
+            if request.method != method:
+                continue
+            found = pattern.fullmatch(request.path)
+            if found:
+                return handler, found.groupdict()
+        return None, None
+
+    @staticmethod
+    async def read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    async def send_response(send, status, headers, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    async def run_blocking(executor, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    @staticmethod
+    def cors_headers(request):
+        # Mirrors flask-cors for the routes answered here; preflights still go to Flask
+        options = core.CORS_OPTIONS
+        origin = request.headers.get('origin')
+        if not origin or origin not in options['origins']:
+            return []
+        headers = [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+        if options.get('supports_credentials'):
+            headers.append((b'access-control-allow-credentials', b'true'))
+        if options.get('expose_headers'):
+            headers.append((b'access-control-expose-headers', ', '.join(options['expose_headers']).encode('latin-1')))
+        return headers
+
+    # Lifecycle
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.ensure_started()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def ensure_started(self):
+        # Servers without lifespan support start the app on its first request instead
+        if self._started:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            if asyncpg is None:
+                raise ImportError("The asyncpg package is required for the ASGI server")
+            await self.run_blocking(self.wsgi_executor, core.initialize_app)
+            await self.get_pool()
+            self._started = True
+
+    async def shutdown(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        self.inference_executor.shutdown(wait=False)
+        self.wsgi_executor.shutdown(wait=False)
+
+    async def get_pool(self):
+        if self.pool is not None:
+            return self.pool
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self.pool is None:
+                try:
+                    self.pool = await asyncpg.create_pool(
+                        core.app.config['DATABASE_URL'],
+                        min_size=core.app.config['ASYNC_DB_POOL_MIN'],
+                        max_size=core.app.config['ASYNC_DB_POOL_MAX'],
+                        init=init_connection
+                    )
+                    logger.info(
+                        f"Async database pool created (min={core.app.config['ASYNC_DB_POOL_MIN']}, "
+                        f"max={core.app.config['ASYNC_DB_POOL_MAX']})"
+                    )
+                except Exception as e:
+                    logger.warning(f"Async database connection failed: {e}")
+        return self.pool
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        """Yield a pooled connection, or None if the database is unavailable."""
+        pool = await self.get_pool()
+        conn = None
+        if pool is not None:
+            try:
+                conn = await pool.acquire(timeout=core.app.config['DB_POOL_TIMEOUT'])
+            except asyncio.TimeoutError:
+                logger.warning("Timed out waiting for a database connection from the pool")
+            except Exception as e:
+                logger.warning(f"Database connection failed: {e}")
+        try:
+            yield conn
+        finally:
+            if conn is not None:
+                await pool.release(conn)
+
+    # Shared steps
+
+    async def authenticate(self, request):
+        """Return (user, None), or (None, (status, payload)) like ``token_required``."""
+        auth_header = request.headers.get('authorization', '')
+        token = auth_header[7:] if auth_header.startswith('Bearer ') else None
+        if not token:
+            return None, (401, {'message': 'Token is missing!'})
+
+        with core.STAGE_SECONDS.time('auth'):
+            try:
+                data = core.jwt.decode(jwt=token, key=core.app.config['SECRET_KEY'], algorithms=["HS256"])
+                await self.sync_user_cache()
+                current_user = core.user_cache.get(str(data['user_id']))
+                if current_user is None:
+                    async with self.connection() as conn:
+                        if conn is None:
+                            return None, (500, {'message': 'Database unavailable'})
+                        current_user = await conn.fetchrow(
+                            "SELECT id, name, email, role FROM users WHERE id = $1", data['user_id']
+                        )
+                    if not current_user:
+                        return None, (401, {'message': 'User no longer exists!'})
+                    current_user = dict(current_user)
+                    core.user_cache.set(str(data['user_id']), current_user)
+            except Exception:
+                return None, (401, {'message': 'Token is invalid!'})
+        return current_user, None
+
+    async def sync_user_cache(self):
+        """Drop users other workers changed recently, like ``app.sync_user_cache``."""
+        if not core.user_cache_sync_due():
+            return
+        try:
+            async with self.connection() as conn:
+                if conn is None:
+                    return
+                changed = await conn.fetch(
+                    to_asyncpg(core.RECENT_USER_CHANGES_SQL), float(core.app.config['USER_CACHE_TTL'])
+                )
+        except Exception as e:
+            logger.warning(f"User cache sync failed: {e}")
+            return
+        for record in changed:
+            core.invalidate_cached_user(record['user_id'])
+
+    async def save_messages(self, rows):
+        """Insert rows in one statement; returns their ids, or None if they could not be saved."""
+        try:
+            async with self.connection() as conn:
+                if conn is None:
+                    logger.error("Failed to get database connection")
+                    return None
+                returned = await conn.fetch(INSERT_MESSAGES, *([row[column] for row in rows] for column in INSERT_COLUMNS))
+        except Exception as e:
+            logger.error(f"Database save error: {e}", exc_info=True)
+            return None
+        ids = {str(record['uuid']): record['id'] for record in returned}
+        return [ids.get(row['uuid']) for row in rows]
+
+    async def persist(self, results, rows, near_duplicates, stage):
+        """Write or queue scored rows the way the Flask routes do; returns whether they were saved."""
+        if core.message_writer is not None:
+            # enqueue can block while the queue is full, so keep it off the event loop
+            with core.STAGE_SECONDS.time(stage.replace('insert', 'enqueue')):
+                await self.run_blocking(self.inference_executor, core.queue_messages, results, rows, near_duplicates)
+            return False
+        with core.STAGE_SECONDS.time(stage):
+            ids = await self.save_messages(rows)
+        saved = bool(ids) and all(message_id is not None for message_id in ids)
+        core.record_saved_messages(results, ids, near_duplicates)
+        return saved
+
+    async def count_messages(self, conn, where_clause, params, mode, table="messages"):
+        """Async counterpart of ``app.count_messages``, sharing its count cache."""
+        if mode == 'none':
+            return None
+        if mode == 'estimate':
+            plan = await conn.fetchval(to_asyncpg(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} {where_clause}"), *params)
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+
+        key = core.count_cache_key(table, where_clause, params)
+        total = core.count_cache.get(key)
+        if total is None:
+            total = await conn.fetchval(to_asyncpg(f"SELECT COUNT(*) AS count FROM {table} {where_clause}"), *params)
+            core.count_cache.set(key, total)
+        return total
+
+    # Handlers; each returns (status, payload, extra headers)
+
+    async def predict_spam(self, request):
+        current_user, error = await self.authenticate(request)
+        if error:
+            return error + ([],)
+        try:
+            data = request.get_json()
+            if not isinstance(data, dict) or not data.get('message'):
+                return 400, {'error': 'No message provided'}, []
+
+            message = data.get('message')
+            message_type = data.get('type', 'email')
+            if not core.valid_message_type(message_type):
+                return 400, {'error': f"Message type must be a string of at most {core.MESSAGE_TYPE_MAX_LENGTH} characters"}, []
+            result, signature, match = await self.run_blocking(
+                self.inference_executor, core.classify_message, message, message_type
+            )
+
+            row = core.message_row(current_user['id'], message, message_type, result['language'],
+                                   result['isSpam'], result['confidence'], result['indicators'],
+                                   model_version=result['modelVersion'], campaign_id=core.campaign_of(match))
+            result['uuid'] = row['uuid']
+            result['saved_to_db'] = await self.persist([result], [row], [(signature, match)], 'db_insert')
+            return 200, result, []
+
+        except Exception as e:
+            logger.error(f"Prediction error: {e}")
+            return 500, {'error': 'Error detecting spam', 'details': str(e)}, []
+
+    async def predict_spam_batch(self, request):
+        current_user, error = await self.authenticate(request)
+        if error:
+            return error + ([],)
+        try:
+            data = request.get_json()
+            items, error = core.parse_batch_request(data if isinstance(data, dict) else None)
+            if error:
+                return error[1], {'error': error[0]}, []
+
+            timestamp = datetime.now(timezone.utc)
+            results, near_duplicates = await self.run_blocking(
+                self.inference_executor, core.classify_batch, items, timestamp
+            )
+
+            rows = [
+                core.message_row(current_user['id'], message, result['type'], result['language'],
+                                 result['isSpam'], result['confidence'], result['indicators'], timestamp,
+                                 result['modelVersion'], core.campaign_of(match))
+                for (message, _), result, (_, match) in zip(items, results, near_duplicates)
+            ]
+            for result, row in zip(results, rows):
+                result['uuid'] = row['uuid']
+
+            saved_successfully = await self.persist(results, rows, near_duplicates, 'batch_db_insert')
+            return 200, {'results': results, 'count': len(results), 'saved_to_db': saved_successfully}, []
+
+        except Exception as e:
+            logger.error(f"Batch prediction error: {e}")
+            return 500, {'error': 'Error detecting spam', 'details': str(e)}, []
+
+    async def get_message_id(self, request, message_uuid):
+        current_user, error = await self.authenticate(request)
+        if error:
+            return error + ([],)
+        message_uuid = message_uuid.lower()
+        try:
+            async with self.connection() as conn:
+                if conn is None:
+                    return 500, {'error': 'Database unavailable'}, []
+                message_id = await conn.fetchval(
+                    "SELECT id FROM messages WHERE uuid = $1 AND user_id = $2", message_uuid, current_user['id']
+                )
+
+            if message_id is not None:
+                return 200, {'uuid': message_uuid, 'id': message_id, 'status': 'saved'}, []
+            # The row may be queued in another worker, see app.get_message_id
+            if core.message_writer is not None:
+                return 202, {'uuid': message_uuid, 'id': None, 'status': 'pending'}, []
+            return 404, {'error': 'Message not found'}, []
+
+        except Exception as e:
+            logger.error(f"Message lookup error: {e}")
+            return 500, {'error': 'Failed to look up message'}, []
+
+    async def get_detection_history(self, request):
+        current_user, error = await self.authenticate(request)
+        if error:
+            return error + ([],)
+        try:
+            limit = request.arg('limit', 50, type=int)
+            offset = request.arg('offset', 0, type=int)
+            filter_spam = request.arg('spam_only')
+            page_cursor = request.arg('cursor')
+            count_mode = request.arg('count', 'exact')
+
+            if count_mode not in ('exact', 'estimate', 'none'):
+                return 400, {'error': 'count must be exact, estimate or none', 'history': []}, []
+            try:
+                after = core.decode_page_cursor(page_cursor) if page_cursor else None
+            except ValueError as e:
+                return 400, {'error': str(e), 'history': []}, []
+
+            query, page_params, where_clause, params = core.history_page_query(
+                current_user['id'], filter_spam, after, limit, offset
+            )
+            if after:
+                offset = 0
+
+            async with self.connection() as conn:
+                if conn is None:
+                    return 500, {'error': 'Database unavailable', 'history': []}, []
+                messages = await conn.fetch(to_asyncpg(query), *page_params)
+                total_count = await self.count_messages(conn, where_clause, params, count_mode)
+
+            return 200, core.format_history_page(messages, total_count, limit, offset), []
+
+        except Exception as e:
+            logger.error(f"Error fetching history: {e}")
+            return 500, {'error': 'Error fetching history', 'history': []}, []
+
+    async def get_detection_stats(self, request):
+        current_user, error = await self.authenticate(request)
+        if error:
+            return error + ([],)
+        try:
+            queries = core.DETECTION_STATS_QUERIES
+            async with self.connection() as conn:
+                if conn is None:
+                    return 500, {'error': 'Database unavailable'}, []
+                overall_stats = await conn.fetchrow(to_asyncpg(queries['overall']), current_user['id'])
+                type_stats = await conn.fetch(to_asyncpg(queries['by_type']), current_user['id'])
+                recent_activity = await conn.fetch(to_asyncpg(queries['recent']), current_user['id'])
+
+            return 200, core.format_detection_stats(overall_stats, type_stats, recent_activity), []
+
+        except Exception as e:
+            logger.error(f"Error getting stats: {e}")
+            return 500, {'error': 'Error getting statistics'}, []
+
+application = AsyncApp(core.app)
@@ -0,0 +1,180 @@
+"""Load test for the HTTP API.
+
+Drives each endpoint scenario at a fixed concurrency and reports throughput and
+p50/p95/p99 latency. By default the app runs in-process with Flask's test client
+and an in-memory stand-in for the database (``benchmarks.memory_db``), so the
+numbers isolate application cost and need no PostgreSQL. With ``--url`` the
+same scenarios run over HTTP against a running server and its real database.
+
+    python -m benchmarks.api_load --requests 2000 --concurrency 8 --json bench_api.json
+    python -m benchmarks.api_load --url http://localhost:5000 --scenarios predict,history
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import load_traffic, percentile, save_results
+
+# name -> (method, path, needs admin token, body builder taking the message text)
+SCENARIOS = {
+    'predict': ('POST', '/api/predict', False, lambda text: {'message': text, 'type': 'email'}),
+    'predict_batch': ('POST', '/api/predict/batch', False, None),
+    'test_predict': ('POST', '/api/test-predict', False, lambda text: {'message': text}),
+    'history': ('GET', '/api/messages/history?limit=50', False, None),
+    'detection_stats': ('GET', '/api/messages/stats', False, None),
+    'admin_stats': ('GET', '/api/admin/stats', True, None),
+    'admin_analytics': ('GET', '/api/admin/analytics', True, None),
+    'admin_users': ('GET', '/api/admin/users', True, None),
+    'admin_messages': ('GET', '/api/admin/messages?limit=50', True, None),
+}
+
+DEFAULT_SCENARIOS = 'predict,test_predict,history,admin_stats,admin_analytics,admin_users,admin_messages'
+
+class InProcessClient:
+    """Runs requests through Flask's test client with the in-memory database installed."""
+
+    def __init__(self, seed_users, seed_messages, texts):
+        import app
+        from benchmarks.memory_db import MemoryDatabase
+
+        self.app = app
+        self.db = MemoryDatabase()
+        admin_id, user_ids = self.db.seed(texts, users=seed_users, seed_messages=seed_messages)
+        app.get_db_connection = self.db.connect
+        if app.message_writer is not None:
+            app.message_writer.get_connection = self.db.connect
+        if not app.load_models():
+            app.train_models()
+
+        self.tokens = {
+            True: app.jwt.encode({'user_id': admin_id}, app.app.config['SECRET_KEY'], algorithm='HS256'),
+            False: app.jwt.encode({'user_id': user_ids[0]}, app.app.config['SECRET_KEY'], algorithm='HS256'),
+        }
+        self._local = threading.local()
+
+    def request(self, method, path, admin, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.app.test_client()
+        response = client.open(
+            path, method=method, json=body,
+            headers={'Authorization': f'Bearer {self.tokens[admin]}'}
+        )
+        return response.status_code
+
+class HttpClient:
+    def __init__(self, url, email, password, admin_email, admin_password):
+        self.url = url.rstrip('/')
+        self.tokens = {False: self._login(email, password), True: self._login(admin_email, admin_password)}
+
+    def _login(self, email, password):
+        status, body = self._send('POST', '/api/auth/login', None, {'email': email, 'password': password})
+        if status != 200:
+            raise SystemExit(f"Login as {email} failed with HTTP {status}")
+        return json.loads(body)['token']
+
+    def _send(self, method, path, token, body):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if token:
+            request.add_header('Authorization', f'Bearer {token}')
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def request(self, method, path, admin, body):
+        return self._send(method, path, self.tokens[admin], body)[0]
+
+def run_scenario(client, scenario, texts, requests, concurrency, batch_size):
+    method, path, admin, build_body = SCENARIOS[scenario]
+    if scenario == 'predict_batch':
+        build_body = lambda text, i: {'messages': [texts[(i + j) % len(texts)] for j in range(batch_size)]}
+    elif build_body is not None:
+        build_body = (lambda builder: lambda text, i: builder(text))(build_body)
+    else:
+        build_body = lambda text, i: None
+
+    latencies = [0.0] * requests
+    statuses = [0] * requests
+
+    def one(i):
+        body = build_body(texts[i % len(texts)], i)
+        start = time.perf_counter()
+        statuses[i] = client.request(method, path, admin, body)
+        latencies[i] = time.perf_counter() - start
+
+    # Warm up caches and lazily built state before measuring
+    for i in range(min(concurrency, requests)):
+        one(i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    errors = sum(1 for status in statuses if status >= 400)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'throughput_rps': requests / elapsed,
+        'mean_ms': sum(latencies) / requests * 1000,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS, help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=1000, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--messages', type=int, default=5000, help='messages from the bundled datasets used as traffic')
+    parser.add_argument('--batch-size', type=int, default=50, help='messages per request for predict_batch')
+    parser.add_argument('--seed-users', type=int, default=10, help='users in the in-memory database')
+    parser.add_argument('--seed-messages', type=int, default=20000, help='history rows in the in-memory database')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--email', default='admin@example.com', help='user to log in as with --url')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--admin-email', default='admin@example.com', help='admin to log in as with --url')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    texts = load_traffic(args.messages)
+    if args.url:
+        client = HttpClient(args.url, args.email, args.password, args.admin_email, args.admin_password)
+    else:
+        client = InProcessClient(args.seed_users, args.seed_messages, texts)
+
+    results = {
+        'target': args.url or 'in-process (memory database)',
+        'traffic_messages': len(texts),
+        'scenarios': {}
+    }
+    print(f"{'scenario':<18}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for scenario in scenarios:
+        result = run_scenario(client, scenario, texts, args.requests, args.concurrency, args.batch_size)
+        results['scenarios'][scenario] = result
+        print(f"{scenario:<18}{result['throughput_rps']:>10.1f}{result['p50_ms']:>10.2f}"
+              f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}")
+
+    if args.json:
+        save_results(args.json, 'api_load', results)
+
+if __name__ == '__main__':
+    main()
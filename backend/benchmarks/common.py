@@ -0,0 +1,70 @@
+"""Shared helpers for the benchmark scripts.
+
+Run the benchmarks from the backend directory, e.g. ``python -m benchmarks.preprocessing``,
+so that ``app`` and the bundled CSV files resolve the same way they do for the server.
+"""
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import pandas as pd
+
+TRAFFIC_SOURCES = [
+    ('Dataset_5971.csv', 'TEXT'),
+    ('emails.csv', 'Message'),
+    ('Bangla_Email_Dataset.csv', 'Text'),
+    ('spanish_spam.csv', 'message'),
+]
+
+def load_traffic(limit=None):
+    """Return message texts from the bundled datasets, falling back to a few samples."""
+    messages = []
+    for filename, column in TRAFFIC_SOURCES:
+        if not os.path.exists(filename):
+            continue
+        for encoding in ['utf-8', 'latin-1']:
+            try:
+                df = pd.read_csv(filename, encoding=encoding, usecols=[column])
+                break
+            except (UnicodeDecodeError, ValueError):
+                continue
+        else:
+            continue
+        messages.extend(text for text in df[column].dropna().astype(str) if text.strip())
+
+    if not messages:
+        messages = [
+            "Win $1000 cash now! Call 555-0123!",
+            "Meeting at 3pm tomorrow",
+            "¡Felicitaciones! Has ganado 1000 euros gratis",
+            "আপনি ১ লক্ষ টাকা জিতেছেন! কল করুন",
+        ]
+    return messages[:limit] if limit else messages
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def save_results(path, name, results):
+    """Write results as JSON with enough metadata to compare runs across commits."""
+    payload = {
+        'benchmark': name,
+        'revision': git_revision(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Results written to {path}")
@@ -0,0 +1,107 @@
+"""Speed and exactness of the compiled Naive Bayes inference path.
+
+For each served language, the bundled traffic routed to it is scored three
+ways: scikit-learn as ``predict_with_ml_model`` used to call it
+(``transform``, ``predict``, ``predict_proba`` per message), the compiled
+predictor of ``nb_inference.py`` one message at a time, and both in batches of
+``--batch-size``. Times are the best of ``--repeat`` runs. Every label and
+probability of the compiled path is compared with scikit-learn's for equality,
+so any mismatch is reported rather than hidden in a tolerance.
+
+    python -m benchmarks.inference --limit 2000 --json bench_inference.json
+"""
+import argparse
+import time
+
+import numpy as np
+
+import app
+from benchmarks.common import load_traffic, save_results
+
+def best_time(run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def batches(texts, size):
+    return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=int, default=2000, help='messages of traffic to score')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions (best is reported)')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    if not app.load_models():
+        app.train_models()
+    model_set = app.active_models
+
+    by_language = {}
+    for message in load_traffic(args.limit):
+        language = app.preprocessor.detect_language(message)
+        processed = app.preprocessor.preprocess_text(message, language)
+        if language in model_set.models and processed.strip():
+            by_language.setdefault(language, []).append(processed)
+
+    results = {'batch_size': args.batch_size, 'languages': {}}
+    print(f"{'language':<10}{'featurizer':<24}{'messages':>9}{'sklearn us':>12}{'compiled us':>13}{'speedup':>9}"
+          f"{'batch sk us':>13}{'batch us':>10}{'exact':>7}")
+    for language, texts in sorted(by_language.items()):
+        model, vectorizer = model_set.models[language], model_set.vectorizers[language]
+        predictor = model_set.predictors.get(language)
+        if predictor is None:
+            print(f"{language:<10}{type(vectorizer).__name__:<24}{len(texts):>9}  no compiled predictor")
+            continue
+
+        def sklearn_single():
+            for text in texts:
+                X = vectorizer.transform([text])
+                model.predict(X)
+                model.predict_proba(X)
+
+        def compiled_single():
+            for text in texts:
+                predictor.predict_row(predictor.transform_row(text))
+
+        def sklearn_batch():
+            for batch in batches(texts, args.batch_size):
+                model.predict_proba(vectorizer.transform(batch))
+
+        def compiled_batch():
+            for batch in batches(texts, args.batch_size):
+                predictor.predict(predictor.transform(batch))
+
+        X = vectorizer.transform(texts)
+        labels, probabilities = model.predict(X), model.predict_proba(X)
+        batch_labels, batch_probabilities = predictor.predict(predictor.transform(texts))
+        rows = [predictor.predict_row(predictor.transform_row(text)) for text in texts]
+        exact = bool(
+            np.array_equal(labels, batch_labels) and np.array_equal(probabilities, batch_probabilities)
+            and np.array_equal(labels, [label for label, _ in rows])
+            and np.array_equal(probabilities, [row for _, row in rows])
+        )
+
+        result = {
+            'featurizer': type(vectorizer).__name__,
+            'messages': len(texts),
+            'sklearn_us': best_time(sklearn_single, args.repeat) / len(texts) * 1e6,
+            'compiled_us': best_time(compiled_single, args.repeat) / len(texts) * 1e6,
+            'sklearn_batch_us': best_time(sklearn_batch, args.repeat) / len(texts) * 1e6,
+            'compiled_batch_us': best_time(compiled_batch, args.repeat) / len(texts) * 1e6,
+            'exact': exact,
+        }
+        results['languages'][language] = result
+        print(f"{language:<10}{result['featurizer']:<24}{len(texts):>9}{result['sklearn_us']:>12.1f}"
+              f"{result['compiled_us']:>13.1f}{result['sklearn_us'] / result['compiled_us']:>8.1f}x"
+              f"{result['sklearn_batch_us']:>13.1f}{result['compiled_batch_us']:>10.1f}{'yes' if exact else 'NO':>7}")
+
+    if args.json:
+        save_results(args.json, 'inference', results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Accuracy and speed of language detection.
+
+Compares the profile-based detector (``language_detector.py`` with the data files
+in ``language_profiles/``) with a reference copy of the former regex-ratio
+detector on the bundled datasets, each of which is in a single language, and on
+the synthetic training samples. Per source it reports accuracy and the best
+time per message over ``--repeat`` runs; the detector's token cache is warm, as
+in a long-running server.
+
+The shipped n-gram profiles were built from these same datasets, so the
+held-out column rebuilds them from a random half of each language's texts and
+scores the other half. The text of Bangla_Email_Dataset.csv was damaged before
+it was bundled (every Bengali character became ``?``), so no detector can
+recognise it; it is listed for completeness and left out of the totals.
+
+    python -m benchmarks.language_detection --repeat 5 --json bench_language.json
+"""
+import argparse
+import os
+import random
+import time
+
+import pandas as pd
+
+import app
+from benchmarks.common import save_results
+from benchmarks.preprocessing import legacy_detect_language
+from language_detector import LanguageDetector, build_profile
+
+# filename -> (text column, language, encoding or None to sniff it like training does)
+SOURCES = {
+    'Dataset_5971.csv': ('TEXT', 'english', None),
+    'emails.csv': ('Message', 'english', None),
+    # Mac Roman; sniffing settles on cp1252 and garbles the accents
+    'spanish_spam.csv': ('message', 'spanish', 'mac_roman'),
+    'Bangla_Email_Dataset.csv': ('Text', 'bangla', None),
+}
+
+DAMAGED_SOURCES = {'Bangla_Email_Dataset.csv'}
+
+def load_sources():
+    """Return ``{source: (texts, language)}`` for the datasets found and the synthetic samples."""
+    sources = {}
+    for filename, (column, language, encoding) in SOURCES.items():
+        if not os.path.exists(filename):
+            continue
+        df = pd.read_csv(
+            filename, encoding=encoding or app.sniff_encoding(filename), encoding_errors='replace',
+            usecols=[column], dtype=str
+        )
+        sources[filename] = ([text for text in df[column].dropna() if text.strip()], language)
+
+    for text, _, language in app.SYNTHETIC_TRAINING_DATA:
+        sources.setdefault(f'synthetic {language}', ([], language))[0].append(text)
+    return sources
+
+def accuracy(detect, texts, language):
+    return sum(1 for text in texts if detect(text) == language) / len(texts)
+
+def time_per_message(detect, texts, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            detect(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+def holdout_detectors(sources, detector, seed):
+    """Split each source in half; returns (detector with n-gram profiles rebuilt from the first halves, test halves)."""
+    rng = random.Random(seed)
+    train, test = {}, {}
+    for name, (texts, language) in sources.items():
+        shuffled = list(texts)
+        rng.shuffle(shuffled)
+        middle = len(shuffled) // 2
+        train.setdefault(language, []).extend(shuffled[:middle])
+        test[name] = shuffled[middle:]
+
+    profiles = [
+        {'language': language, 'ranges': [f"{start:04X}-{end:04X}" for start, end in ranges], 'min_share': min_share}
+        for language, ranges, min_share in detector.script_languages
+    ]
+    profiles += [build_profile(language, train[language]) for language in detector.ngram_languages]
+    return LanguageDetector(profiles), test
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions (best is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='seed for the held-out split')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    detector = app.preprocessor.language_detector
+    detect = lambda text: detector.detect(text)[0]
+    sources = load_sources()
+    holdout_detector, holdout_texts = holdout_detectors(
+        {name: source for name, source in sources.items() if name in SOURCES and name not in DAMAGED_SOURCES},
+        detector, args.seed
+    )
+
+    results = {'languages': detector.languages, 'sources': {}}
+    print(f"{'source':<26}{'messages':>9}{'legacy acc':>12}{'new acc':>9}{'held-out':>10}"
+          f"{'legacy us':>11}{'new us':>8}{'speedup':>9}")
+    totals = {'messages': 0, 'legacy_correct': 0, 'new_correct': 0, 'legacy_seconds': 0.0, 'new_seconds': 0.0}
+    for name, (texts, language) in sources.items():
+        # Warm the token cache the way steady traffic does
+        for text in texts:
+            detect(text)
+        result = {
+            'language': language,
+            'messages': len(texts),
+            'legacy_accuracy': accuracy(legacy_detect_language, texts, language),
+            'new_accuracy': accuracy(detect, texts, language),
+            'holdout_accuracy': None,
+            'legacy_us': time_per_message(legacy_detect_language, texts, args.repeat),
+            'new_us': time_per_message(detect, texts, args.repeat),
+        }
+        if holdout_texts.get(name):
+            result['holdout_accuracy'] = accuracy(lambda text: holdout_detector.detect(text)[0], holdout_texts[name], language)
+        results['sources'][name] = result
+
+        if name not in DAMAGED_SOURCES:
+            totals['messages'] += len(texts)
+            totals['legacy_correct'] += result['legacy_accuracy'] * len(texts)
+            totals['new_correct'] += result['new_accuracy'] * len(texts)
+            totals['legacy_seconds'] += result['legacy_us'] * len(texts)
+            totals['new_seconds'] += result['new_us'] * len(texts)
+
+        holdout = f"{result['holdout_accuracy']:.3f}" if result['holdout_accuracy'] is not None else '-'
+        print(f"{name:<26}{len(texts):>9}{result['legacy_accuracy']:>12.3f}{result['new_accuracy']:>9.3f}{holdout:>10}"
+              f"{result['legacy_us']:>11.2f}{result['new_us']:>8.2f}{result['legacy_us'] / result['new_us']:>8.2f}x")
+
+    if totals['messages']:
+        results['overall'] = {
+            'messages': totals['messages'],
+            'legacy_accuracy': totals['legacy_correct'] / totals['messages'],
+            'new_accuracy': totals['new_correct'] / totals['messages'],
+            'legacy_us': totals['legacy_seconds'] / totals['messages'],
+            'new_us': totals['new_seconds'] / totals['messages'],
+        }
+        overall = results['overall']
+        print(f"{'overall (undamaged)':<26}{overall['messages']:>9}{overall['legacy_accuracy']:>12.3f}"
+              f"{overall['new_accuracy']:>9.3f}{'':>10}{overall['legacy_us']:>11.2f}{overall['new_us']:>8.2f}"
+              f"{overall['legacy_us'] / overall['new_us']:>8.2f}x")
+
+    if args.json:
+        save_results(args.json, 'language_detection', results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""In-memory stand-in for ``app.get_db_connection`` used by the load benchmark.
+
+It understands just enough of the SQL issued by the benchmarked endpoints to
+return realistically shaped rows: users, inserted messages, history pages,
+counts and dashboard aggregates. Like the real schema it keeps messages in
+insertion (time) order per user and maintains a daily rollup, so pages and
+dashboards cost about what their indexed queries would; the numbers measure
+the application itself. Point the benchmark at a server with ``--url`` for
+end-to-end figures against PostgreSQL.
+"""
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from psycopg2.extras import RealDictCursor
+
+LIMIT_RE = re.compile(r'LIMIT\s+(\d+|%s)', re.IGNORECASE)
+WINDOW_RE = re.compile(r"DAY >= \(NOW\(\) - INTERVAL '(\d+) DAYS'\)")
+
+class MemoryDatabase:
+    def __init__(self):
+        self.users = {}
+        self.messages = []
+        self.by_user = defaultdict(list)
+        # (day, type, language, user_id) -> [total, spam, spam confidence sum, ham confidence sum]
+        self.rollup = defaultdict(lambda: [0, 0, 0.0, 0.0])
+        self.next_message_id = 1
+        self.lock = threading.Lock()
+        self.queries = 0
+
+    def add_user(self, name, email, role='user'):
+        user_id = len(self.users) + 1
+        self.users[user_id] = {
+            'id': user_id, 'name': name, 'email': email, 'password': '', 'role': role,
+            'created_at': datetime(2024, 1, 1)
+        }
+        return user_id
+
+    def add_message(self, user_id, content, message_type, language, is_spam, confidence, created_at=None, row_uuid=None,
+                    campaign_id=None):
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+            message = {
+                'id': message_id, 'uuid': row_uuid, 'user_id': user_id, 'content': content, 'type': message_type,
+                'language': language, 'is_spam': is_spam, 'confidence': confidence, 'spam_indicators': {},
+                'created_at': created_at or datetime.utcnow(), 'label': None, 'campaign_id': campaign_id
+            }
+            self.messages.append(message)
+            self.by_user[user_id].append(message)
+            counters = self.rollup[(message['created_at'].date(), message_type, language, user_id)]
+            counters[0] += 1
+            counters[1] += bool(is_spam)
+            counters[2 if is_spam else 3] += confidence
+            return message_id
+
+    def seed(self, texts, users=10, seed_messages=10000):
+        """Create an admin, ``users`` regular users and ``seed_messages`` history rows spread over 30 days."""
+        admin_id = self.add_user('Admin User', 'admin@example.com', 'admin')
+        user_ids = [self.add_user(f'User {i}', f'user{i}@example.com') for i in range(users)]
+        start = datetime.utcnow() - timedelta(days=30)
+        step = timedelta(days=30) / max(seed_messages, 1)
+        types = ('email', 'sms', 'social')
+        for i in range(seed_messages):
+            self.add_message(
+                user_ids[i % len(user_ids)], texts[i % len(texts)], types[i % 3], 'english',
+                i % 3 == 0, 0.6 + (i % 40) / 100, start + step * i
+            )
+        return admin_id, user_ids
+
+    def connect(self):
+        return MemoryConnection(self)
+
+class MemoryConnection:
+    encoding = 'UTF8'
+    closed = 0
+    autocommit = False
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def connection(self):
+        return self
+
+    def cursor(self, cursor_factory=None):
+        return MemoryCursor(self.db, as_dict=cursor_factory is RealDictCursor)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+class MemoryCursor:
+    def __init__(self, db, as_dict):
+        self.db = db
+        self.as_dict = as_dict
+        self.connection = MemoryConnection(db)
+        self._rows = []
+        self._mogrified = []
+
+    def mogrify(self, template, args):
+        # execute_values builds its statement from these fragments
+        self._mogrified.append(args)
+        return b'(?)'
+
+    def execute(self, sql, params=None):
+        self.db.queries += 1
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8')
+        sql = ' '.join(sql.split())
+        params = list(params or [])
+        upper = sql.upper()
+
+        if upper.startswith('INSERT INTO MESSAGES'):
+            rows = self._mogrified or [None]
+            self._mogrified = []
+            result = []
+            for row in rows:
+                if isinstance(row, dict):
+                    message_id = self.db.add_message(
+                        row['user_id'], row['content'], row['type'], row['language'], row['is_spam'],
+                        row['confidence'], row['created_at'].replace(tzinfo=None), row['uuid'], row['campaign_id']
+                    )
+                    result.append({'uuid': row['uuid'], 'id': message_id})
+            self._set(result, ('uuid', 'id'))
+        elif upper.startswith('SELECT ID, NAME, EMAIL, ROLE FROM USERS WHERE ID'):
+            user = self.db.users.get(params[0])
+            self._set([{column: user[column] for column in ('id', 'name', 'email', 'role')}] if user else [])
+        elif 'FROM USERS U LEFT JOIN MESSAGES' in upper:
+            self._set(self._user_summaries())
+        elif upper.startswith('SELECT COUNT(*) AS TOTAL FROM USERS'):
+            self._set([{'total': len(self.db.users)}])
+        elif 'FROM MESSAGE_DAILY_ROLLUP' in upper:
+            self._set(self._rollup(upper, params))
+        elif upper.startswith('EXPLAIN'):
+            self._set([{'QUERY PLAN': [{'Plan': {'Plan Rows': len(self._filter(upper, params))}}]}], ('QUERY PLAN',))
+        elif upper.startswith('SELECT COUNT(*) AS COUNT FROM MESSAGES'):
+            self._set([{'count': len(self._filter(upper, params))}], ('count',))
+        elif 'FROM MESSAGES' in upper and 'ORDER BY' in upper:
+            self._set(self._page(upper, params))
+        else:
+            self._rows = []
+
+    def _set(self, rows, columns=None):
+        if self.as_dict:
+            self._rows = [dict(row) for row in rows]
+        else:
+            self._rows = [tuple(row[c] for c in columns) if columns else tuple(row.values()) for row in rows]
+
+    def _filters(self, upper, params):
+        """Return the user_id / is_spam / type equality filters of a listing query."""
+        filters = {}
+        values = iter(params)
+        for column in ('USER_ID', 'IS_SPAM', 'TYPE'):
+            if re.search(rf'\b(M\.)?{column} = %S', upper):
+                filters[column.lower()] = next(values)
+        return filters
+
+    def _matching(self, filters):
+        # Newest first, like an index scan on (..., created_at DESC, id DESC)
+        candidates = self.db.by_user.get(filters['user_id'], []) if 'user_id' in filters else self.db.messages
+        for message in reversed(candidates):
+            if all(message[key] == value for key, value in filters.items()):
+                yield message
+
+    def _filter(self, upper, params):
+        return list(self._matching(self._filters(upper, params)))
+
+    def _page(self, upper, params):
+        limit_match = LIMIT_RE.search(upper)
+        limit = params[-2] if limit_match and limit_match.group(1) == '%S' else int(limit_match.group(1)) if limit_match else 50
+        offset = params[-1] if 'OFFSET %S' in upper else 0
+        after = None
+        if 'CREATED_AT, ID) < (%S, %S)' in upper or 'CREATED_AT, M.ID) < (%S, %S)' in upper:
+            after = (params[-4], params[-3])
+
+        page = []
+        for message in self._matching(self._filters(upper, params)):
+            if after and (message['created_at'], message['id']) >= after:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            page.append(message)
+            if len(page) == limit:
+                break
+        return [{**m, 'user_name': self.db.users[m['user_id']]['name'], 'user_email': self.db.users[m['user_id']]['email']} for m in page]
+
+    def _user_summaries(self):
+        counts = defaultdict(lambda: [0, 0])
+        for m in self.db.messages:
+            counts[m['user_id']][0] += 1
+            counts[m['user_id']][1] += m['is_spam']
+        return [
+            {'id': u['id'], 'name': u['name'], 'email': u['email'], 'role': u['role'], 'lastactive': u['created_at'],
+             'messagesscanned': counts[u['id']][0], 'spamdetected': counts[u['id']][1]}
+            for u in self.db.users.values()
+        ]
+
+    def _rollup(self, upper, params):
+        entries = self.db.rollup.items()
+        if 'WHERE USER_ID = %S' in upper:
+            entries = [(key, counters) for key, counters in entries if key[3] == params[0]]
+        window = WINDOW_RE.search(upper)
+        if window:
+            since = (datetime.utcnow() - timedelta(days=int(window.group(1)))).date()
+            entries = [(key, counters) for key, counters in entries if key[0] >= since]
+        if 'GROUP BY TYPE' in upper:
+            group_of = lambda key: key[1]
+        elif 'GROUP BY DAY' in upper:
+            group_of = lambda key: key[0]
+        else:
+            group_of = lambda key: None
+
+        groups = defaultdict(lambda: [0, 0, 0.0, 0.0])
+        for key, counters in entries:
+            group = groups[group_of(key)]
+            for i, value in enumerate(counters):
+                group[i] += value
+        if not groups and 'GROUP BY' not in upper:
+            groups[None] = [0, 0, 0.0, 0.0]
+
+        rows = []
+        for group_key, (total, spam, spam_confidence, ham_confidence) in groups.items():
+            ham = total - spam
+            accuracy = round((spam_confidence + ham_confidence) / total * 100, 2) if total else None
+            rows.append({
+                'type': group_key, 'date': group_key, 'period': group_key,
+                'total': total, 'count': total, 'total_messages': total,
+                'spam_count': spam, 'ham_count': ham, 'clean_count': ham,
+                'avg_spam_confidence': spam_confidence / spam if spam else None,
+                'avg_ham_confidence': ham_confidence / ham if ham else None,
+                'avg_confidence': accuracy, 'accuracy': accuracy
+            })
+        return rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        pass
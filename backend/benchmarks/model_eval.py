@@ -0,0 +1,169 @@
+"""Offline model-quality and inference-cost comparison.
+
+Runs stratified k-fold cross-validation per language over the training data
+for the production configuration (TF-IDF + Naive Bayes, from ``MODEL_PARAMS``)
+and a few alternatives, and reports precision, recall, F1 and ROC-AUC on the
+out-of-fold predictions. Each candidate is then refit on the full language set
+to measure single-message and batched inference throughput (vectorize + score;
+preprocessing is shared by all candidates and excluded), peak memory while
+fitting, and the pickled size of the vectorizer/model pair.
+
+    python -m benchmarks.model_eval --folds 5 --json bench_model_eval.json
+    python -m benchmarks.model_eval --candidates tfidf_nb,char_nb --languages english
+"""
+import argparse
+import pickle
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+import app
+from benchmarks.common import save_results
+
+def tfidf_vectorizer():
+    return TfidfVectorizer(
+        max_features=app.MODEL_PARAMS['max_features'],
+        ngram_range=tuple(app.MODEL_PARAMS['ngram_range']),
+        min_df=app.MODEL_PARAMS['min_df'],
+        max_df=app.MODEL_PARAMS['max_df']
+    )
+
+# name -> builder returning an unfitted (vectorizer, model) pair
+CANDIDATES = {
+    'tfidf_nb': lambda: (tfidf_vectorizer(), MultinomialNB(alpha=app.MODEL_PARAMS['alpha'])),
+    'hashing_nb': lambda: (app.make_hashing_vectorizer(), MultinomialNB(alpha=app.MODEL_PARAMS['alpha'])),
+    'char_nb': lambda: (
+        TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 5), max_features=app.MODEL_PARAMS['max_features'] * 10,
+                        min_df=app.MODEL_PARAMS['min_df'], sublinear_tf=True),
+        MultinomialNB(alpha=app.MODEL_PARAMS['alpha'])
+    ),
+    'tfidf_svm': lambda: (tfidf_vectorizer(), LinearSVC(C=1.0)),
+    'tfidf_logreg': lambda: (tfidf_vectorizer(), LogisticRegression(C=10.0, max_iter=1000)),
+}
+
+def load_eval_data():
+    """Return ``{language: (texts, labels)}`` read exactly as training reads it (``DATASET_CONFIGS``)."""
+    df = app.load_training_data()
+    return {
+        str(language): (group['text'].tolist(), group['label'].astype(int).tolist())
+        for language, group in df.groupby('language', observed=True)
+    }
+
+def spam_scores(model, X):
+    """Scores for ROC-AUC: spam probability, or the margin for models without probabilities."""
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(X)[:, 1]
+    return model.decision_function(X)
+
+def cross_validate(build, texts, labels, folds, seed):
+    labels = np.asarray(labels)
+    predictions = np.zeros(len(labels), dtype=int)
+    scores = np.zeros(len(labels))
+    fit_seconds = []
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for train_idx, test_idx in splitter.split(texts, labels):
+        vectorizer, model = build()
+        start = time.perf_counter()
+        model.fit(vectorizer.fit_transform([texts[i] for i in train_idx]), labels[train_idx])
+        fit_seconds.append(time.perf_counter() - start)
+        X_test = vectorizer.transform([texts[i] for i in test_idx])
+        predictions[test_idx] = model.predict(X_test)
+        scores[test_idx] = spam_scores(model, X_test)
+
+    return {
+        'precision': float(precision_score(labels, predictions, zero_division=0)),
+        'recall': float(recall_score(labels, predictions, zero_division=0)),
+        'f1': float(f1_score(labels, predictions, zero_division=0)),
+        'roc_auc': float(roc_auc_score(labels, scores)),
+        'fit_seconds': float(np.mean(fit_seconds)),
+    }
+
+def measure_cost(build, texts, labels, messages, batch_size):
+    """Refit on everything, then time inference and record peak memory and artifact size."""
+    vectorizer, model = build()
+    tracemalloc.start()
+    model.fit(vectorizer.fit_transform(texts), np.asarray(labels))
+    fit_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    sample = [texts[i % len(texts)] for i in range(messages)]
+    start = time.perf_counter()
+    for text in sample:
+        spam_scores(model, vectorizer.transform([text]))
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, len(sample), batch_size):
+        spam_scores(model, vectorizer.transform(sample[offset:offset + batch_size]))
+    batched = time.perf_counter() - start
+
+    return {
+        'single_msgs_per_sec': messages / single,
+        'batch_msgs_per_sec': messages / batched,
+        'fit_peak_mb': fit_peak / (1024 * 1024),
+        'model_kb': len(pickle.dumps((vectorizer, model), protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', default=','.join(CANDIDATES), help=f"comma-separated, from: {', '.join(CANDIDATES)}")
+    parser.add_argument('--languages', help='comma-separated languages to evaluate (default: all found)')
+    parser.add_argument('--folds', type=int, default=5, help='cross-validation folds')
+    parser.add_argument('--messages', type=int, default=2000, help='messages scored when timing inference')
+    parser.add_argument('--batch-size', type=int, default=100, help='messages per call for batched inference')
+    parser.add_argument('--seed', type=int, default=app.MODEL_PARAMS['random_state'])
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    candidates = [name.strip() for name in args.candidates.split(',') if name.strip()]
+    unknown = [name for name in candidates if name not in CANDIDATES]
+    if unknown:
+        parser.error(f"unknown candidates: {', '.join(unknown)}")
+
+    data = load_eval_data()
+    if args.languages:
+        wanted = {name.strip() for name in args.languages.split(',')}
+        data = {language: value for language, value in data.items() if language in wanted}
+
+    results = {'folds': args.folds, 'languages': {}}
+    for language, (raw_texts, labels) in sorted(data.items()):
+        min_class = min(labels.count(0), labels.count(1))
+        folds = min(args.folds, min_class)
+        if folds < 2:
+            print(f"\n{language}: skipped, needs at least 2 examples of each class")
+            continue
+
+        texts = [app.preprocessor.preprocess_text(text, language) for text in raw_texts]
+        print(f"\n{language}: {len(texts)} messages ({sum(labels)} spam), {folds}-fold CV")
+        print(f"{'candidate':<14}{'prec':>7}{'recall':>8}{'f1':>7}{'auc':>7}"
+              f"{'single/s':>10}{'batch/s':>10}{'fit MB':>8}{'size KB':>9}")
+
+        language_results = results['languages'][language] = {
+            'messages': len(texts), 'spam': sum(labels), 'folds': folds, 'candidates': {}
+        }
+        for name in candidates:
+            try:
+                result = cross_validate(CANDIDATES[name], texts, labels, folds, args.seed)
+                result.update(measure_cost(CANDIDATES[name], texts, labels, args.messages, args.batch_size))
+            except ValueError as e:
+                # e.g. an empty vocabulary when a dataset's text did not survive decoding
+                language_results['candidates'][name] = {'error': str(e)}
+                print(f"{name:<14}skipped: {e}")
+                continue
+            language_results['candidates'][name] = result
+            print(f"{name:<14}{result['precision']:>7.3f}{result['recall']:>8.3f}{result['f1']:>7.3f}"
+                  f"{result['roc_auc']:>7.3f}{result['single_msgs_per_sec']:>10.0f}{result['batch_msgs_per_sec']:>10.0f}"
+                  f"{result['fit_peak_mb']:>8.1f}{result['model_kb']:>9.1f}")
+
+    if args.json:
+        save_results(args.json, 'model_eval', results)
+
+if __name__ == '__main__':
+    main()
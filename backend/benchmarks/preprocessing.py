@@ -0,0 +1,145 @@
+"""Microbenchmark for the per-message preprocessing hot path.
+
+Compares the current pipeline (shared preprocessor, precompiled patterns) with a
+reference copy of the original per-request implementation, which rebuilt the
+preprocessor and the pattern tables for every message.
+
+    python -m benchmarks.preprocessing --messages 2000 --repeat 5 --json bench_preprocessing.json
+"""
+import argparse
+import re
+import time
+import unicodedata
+
+import app
+from benchmarks.common import load_traffic, save_results
+
+def legacy_detect_language(text):
+    text_lower = text.lower()
+    bengali_chars = len(re.findall(r'[\u0980-\u09FF]', text))
+    spanish_chars = len(re.findall(r'[áéíóúñüÁÉÍÓÚÑÜ¿¡àèìòù]', text))
+    total_chars = len(re.sub(r'[\s\d\W]', '', text))
+    if total_chars == 0:
+        return 'english'
+    bengali_ratio = bengali_chars / max(total_chars, 1)
+    spanish_ratio = spanish_chars / max(total_chars, 1)
+    spanish_indicators = [
+        'gratis', 'ganar', 'dinero', 'premio', 'oferta', 'urgente', 'garantía',
+        'descuento', 'felicitaciones', 'euros', 'dólares', 'hola', 'cómo',
+        'qué', 'sí', 'muy', 'bien', 'gracias', 'usted', 'señor', 'ahora'
+    ]
+    spanish_word_count = sum(1 for word in spanish_indicators if word in text_lower)
+    has_spanish_punctuation = bool(re.search(r'[¿¡]', text))
+    if bengali_ratio > 0.1:
+        return 'bangla'
+    if (spanish_ratio > 0.01 or spanish_word_count >= 1 or has_spanish_punctuation or
+            any(word in text_lower for word in ['gratis', 'ganar', 'dinero', 'euros'])):
+        return 'spanish'
+    return 'english'
+
+def legacy_preprocess_text(text, language):
+    text = re.sub(r'\s+', ' ', text.lower().strip())
+    if language == 'bangla':
+        text = re.sub(r'[a-zA-Z0-9]+', ' ', text)
+    elif language == 'spanish':
+        text = re.sub(r'[^\w\sáéíóúñü¿¡àèìòù]', ' ', unicodedata.normalize('NFC', text))
+    elif language == 'english':
+        text = re.sub(r'[^\x00-\x7F]+', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def legacy_indicators(message, language, spam_keywords):
+    message_lower = message.lower()
+    score = sum(1 for keyword in spam_keywords.get(language, []) if keyword.lower() in message_lower)
+    phone_patterns = {
+        'bangla': [r'(\+?88)?[-\s]?01[3-9]\d{8}', r'\b\d{11}\b'],
+        'spanish': [r'\+34\s?\d{9}', r'\b\d{9}\b', r'\b6\d{8}\b'],
+        'english': [r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b']
+    }
+    money_patterns = {
+        'bangla': [r'৳\s*[\d০-৯]+', r'[\d০-৯]+\s*(টাকা|হাজার|লক্ষ|কোটি)'],
+        'spanish': [r'€\s*\d+', r'\d+\s*euros?', r'\d+\s*dólares?'],
+        'english': [r'[$€£]\s*\d+', r'\d+\s*(?:dollars|euro|pound)']
+    }
+    urgent_words = {
+        'bangla': ['জরুরি', 'এখনই', 'তাড়াতাড়ি', 'দ্রুত'],
+        'spanish': ['urgente', 'ahora', 'rápido', 'inmediatamente'],
+        'english': ['urgent', 'now', 'hurry', 'immediately']
+    }
+    score += 2 * any(re.search(p, message) for p in phone_patterns.get(language, []))
+    score += 2 * any(re.search(p, message_lower) for p in money_patterns.get(language, []))
+    score += sum(1 for word in urgent_words.get(language, []) if word.lower() in message_lower)
+    score += 2 * bool(re.search(r'http[s]?://\S+', message))
+    return score
+
+def legacy_keyword_count(message_lower, language):
+    keywords = app.preprocessor.spam_keywords.get(language, []) + app.preprocessor.urgent_words.get(language, [])
+    return sum(1 for keyword in keywords if keyword.lower() in message_lower)
+
+def legacy_pipeline(message):
+    # The original preprocessor rebuilt its keyword table on every request
+    spam_keywords = {language: list(words) for language, words in app.preprocessor.spam_keywords.items()}
+    language = legacy_detect_language(message)
+    legacy_preprocess_text(message, language)
+    return legacy_indicators(message, language, spam_keywords)
+
+def current_pipeline(message):
+    language = app.preprocessor.detect_language(message)
+    app.preprocessor.preprocess_text(message, language)
+    return app.compute_spam_indicators(message, language)[1]
+
+def time_per_message(func, messages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000, help='number of messages from the bundled datasets')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions (best is reported)')
+    parser.add_argument('--keywords-file', help='JSON keyword file to load, to measure larger keyword lists')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    if args.keywords_file:
+        app.preprocessor = app.MultiLanguagePreprocessor(args.keywords_file)
+    messages = load_traffic(args.messages)
+
+    spam_keywords = app.preprocessor.spam_keywords
+    mismatches = 0
+    for message in messages:
+        language = legacy_detect_language(message)
+        if legacy_indicators(message, language, spam_keywords) != app.compute_spam_indicators(message, language)[1]:
+            mismatches += 1
+    if mismatches:
+        print(f"WARNING: {mismatches} messages got a different rule score than the legacy implementation")
+
+    stages = {
+        'detect_language': (legacy_detect_language, app.preprocessor.detect_language),
+        'preprocess_text': (lambda m: legacy_preprocess_text(m, 'spanish'),
+                            lambda m: app.preprocessor.preprocess_text(m, 'spanish')),
+        'keyword_match': (lambda m: legacy_keyword_count(m.lower(), 'english'),
+                          lambda m: app.preprocessor.match_keywords(m.lower(), 'english')),
+        'pipeline': (legacy_pipeline, current_pipeline),
+    }
+
+    results = {
+        'messages': len(messages),
+        'english_keywords': len(app.preprocessor.spam_keywords['english']) + len(app.preprocessor.urgent_words['english']),
+        'stages': {}
+    }
+    print(f"{'stage':<18}{'before (us/msg)':>18}{'after (us/msg)':>18}{'speedup':>10}")
+    for stage, (before, after) in stages.items():
+        before_us = time_per_message(before, messages, args.repeat)
+        after_us = time_per_message(after, messages, args.repeat)
+        results['stages'][stage] = {'before_us': before_us, 'after_us': after_us, 'speedup': before_us / after_us}
+        print(f"{stage:<18}{before_us:>18.2f}{after_us:>18.2f}{before_us / after_us:>9.2f}x")
+
+    if args.json:
+        save_results(args.json, 'preprocessing', results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Bulk scoring of archived messages from CSV or JSON-lines files.
+
+    python bulk_score.py mailbox.csv --text-column body --output scored.jsonl
+    python bulk_score.py archive.jsonl --to-db --user-id 7 --date-column received_at
+
+Input is read ``--chunk-size`` rows at a time and scored by a pool of worker
+processes with the same pipeline as ``/api/predict/batch``: language detection,
+preprocessing, the per-language models and the rule-based indicators. At most
+two chunks per worker are in flight, so memory stays bounded however large the
+input is. Results are written in input order to a JSONL or CSV file, or copied
+straight into the ``messages`` table with ``COPY``, one committed statement per
+chunk; ``--skip`` resumes an interrupted run after the rows already written.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import app
+
+TEXT_CANDIDATES = ['text', 'message', 'body', 'content', 'email', 'TEXT', 'Message', 'Text']
+
+COPY_COLUMNS = ('uuid', 'user_id', 'content', 'type', 'language', 'is_spam', 'confidence', 'spam_indicators', 'created_at', 'model_version')
+COPY_SQL = f"COPY messages ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+OUTPUT_FIELDS = ('id', 'is_spam', 'confidence', 'language', 'type', 'indicators', 'model_version')
+
+def read_csv_chunks(path, args):
+    encoding = app.sniff_encoding(path)
+    header = pd.read_csv(path, encoding=encoding, encoding_errors='replace', nrows=0).columns
+    text_col = args.text_column or app.resolve_column(header, TEXT_CANDIDATES)
+    if text_col not in header:
+        raise SystemExit(f"No text column in {path}; pass --text-column (columns: {', '.join(header)})")
+    columns = {'text': text_col, 'id': args.id_column, 'type': args.type_column, 'created_at': args.date_column}
+    columns = {field: column for field, column in columns.items() if column}
+    missing = [column for column in columns.values() if column not in header]
+    if missing:
+        raise SystemExit(f"Columns not found in {path}: {', '.join(missing)}")
+
+    reader = pd.read_csv(
+        path, encoding=encoding, encoding_errors='replace', usecols=list(set(columns.values())),
+        dtype=str, keep_default_na=False, chunksize=args.chunk_size
+    )
+    for chunk in reader:
+        yield [
+            {field: value for field, value in zip(columns, values)}
+            for values in zip(*(chunk[column].tolist() for column in columns.values()))
+        ]
+
+def read_jsonl_chunks(path, args):
+    fields = {'text': args.text_column or 'message', 'id': args.id_column, 'type': args.type_column, 'created_at': args.date_column}
+    fields = {field: key for field, key in fields.items() if key}
+    with open(path, encoding='utf-8', errors='replace') as f:
+        while True:
+            lines = list(itertools.islice(f, args.chunk_size))
+            if not lines:
+                return
+            records = []
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                # Malformed lines become empty records so that row counts still line up with --skip
+                records.append({
+                    field: str(entry[key]) if isinstance(entry, dict) and entry.get(key) is not None else ''
+                    for field, key in fields.items()
+                })
+            yield records
+
+def init_worker():
+    # A backfill scores history; matching it against live spam campaigns would be meaningless
+    app.near_duplicate_index = None
+    if not app.model_trained and not app.load_models():
+        app.train_models()
+
+def score_chunk(texts, types):
+    """Score one chunk in a worker; returns (is_spam, confidence, language, indicators, model version) per text."""
+    results, _ = app.classify_batch(list(zip(texts, types)), datetime.now(timezone.utc))
+    return [
+        (result['isSpam'], result['confidence'], result['language'], result['indicators'], result['modelVersion'])
+        for result in results
+    ]
+
+class FileOutput:
+    def __init__(self, path, output_format, include_text):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.format = output_format
+        self.fields = OUTPUT_FIELDS + (('text',) if include_text else ())
+        if output_format == 'csv':
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.fields)
+
+    def write(self, rows):
+        for row in rows:
+            if self.format == 'csv':
+                self.writer.writerow([json.dumps(row[field]) if field == 'indicators' else row[field] for field in self.fields])
+            else:
+                self.file.write(json.dumps({field: row[field] for field in self.fields}, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+class CopyOutput:
+    """Streams scored rows into ``messages`` with one COPY statement per chunk."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.conn = app.get_db_connection()
+        if not self.conn:
+            raise SystemExit("Database unavailable; check DATABASE_URL")
+        self.conn.autocommit = False
+
+    def write(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            message = app.message_row(
+                self.user_id, row['text'], row['type'], row['language'],
+                row['is_spam'], row['confidence'], row['indicators'], model_version=row['model_version']
+            )
+            if row['created_at']:
+                # Let PostgreSQL parse the archive's own timestamps
+                message['created_at'] = row['created_at']
+            writer.writerow([message[column] for column in COPY_COLUMNS])
+        buffer.seek(0)
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.copy_expert(COPY_SQL, buffer)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.conn.close()
+
+class Progress:
+    def __init__(self, interval, skipped=0):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.rows = 0
+        self.spam = 0
+        self.empty = 0
+        self.skipped = skipped
+
+    def update(self, rows, spam, empty):
+        self.rows += rows
+        self.spam += spam
+        self.empty += empty
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.start
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        print(
+            f"{'Done: ' if final else ''}{self.rows:,} scored ({self.spam:,} spam, {self.empty:,} empty), "
+            f"{rate:,.0f} msg/s, {elapsed:,.0f}s, input row {self.skipped + self.rows + self.empty:,}",
+            file=sys.stderr, flush=True
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV or JSONL file of messages')
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], help='default: from the file extension')
+    parser.add_argument('--text-column', help='column/field holding the message text (default: text, message, body, ...)')
+    parser.add_argument('--id-column', help='column/field copied to the output to identify each message')
+    parser.add_argument('--type-column', help='column/field holding the message type')
+    parser.add_argument('--date-column', help='column/field used as created_at with --to-db')
+    parser.add_argument('--type', default='email', help='message type when there is no --type-column')
+    parser.add_argument('--output', help='write results to this .jsonl or .csv file')
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'], help='default: from the output extension')
+    parser.add_argument('--include-text', action='store_true', help='copy the message text into the output file')
+    parser.add_argument('--to-db', action='store_true', help='insert the scored messages into PostgreSQL with COPY')
+    parser.add_argument('--user-id', type=int, help='owner of the inserted messages (required with --to-db)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='scoring processes')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='rows read and scored per chunk')
+    parser.add_argument('--skip', type=int, default=0, help='input rows to skip, e.g. to resume an interrupted run')
+    parser.add_argument('--progress-interval', type=float, default=10, help='seconds between progress lines')
+    args = parser.parse_args()
+
+    if bool(args.output) == args.to_db:
+        parser.error('pass exactly one of --output or --to-db')
+    if args.to_db and args.user_id is None:
+        parser.error('--to-db needs --user-id')
+
+    input_format = args.input_format or ('jsonl' if args.input.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    chunks = (read_jsonl_chunks if input_format == 'jsonl' else read_csv_chunks)(args.input, args)
+
+    # Load or train once here; forked workers inherit the models instead of reloading them
+    init_worker()
+    if args.to_db:
+        output = CopyOutput(args.user_id)
+    else:
+        output_format = args.output_format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+        output = FileOutput(args.output, output_format, args.include_text)
+
+    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) if args.workers > 1 else None
+    progress = Progress(args.progress_interval, args.skip)
+    pending = deque()
+    to_skip = args.skip
+
+    def finish(records, scores):
+        rows = []
+        for record, (is_spam, confidence, language, indicators, model_version) in zip(records, scores):
+            rows.append({
+                'id': record.get('id'), 'text': record['text'], 'type': record.get('type') or args.type,
+                'created_at': record.get('created_at'), 'is_spam': is_spam, 'confidence': confidence,
+                'language': language, 'indicators': indicators, 'model_version': model_version
+            })
+        output.write(rows)
+        return rows
+
+    try:
+        for records in chunks:
+            if to_skip:
+                dropped = min(to_skip, len(records))
+                records = records[dropped:]
+                to_skip -= dropped
+            scorable = [record for record in records if record['text'].strip()]
+            empty = len(records) - len(scorable)
+            if not scorable:
+                progress.update(0, 0, empty)
+                continue
+
+            texts = [record['text'] for record in scorable]
+            types = [record.get('type') or args.type for record in scorable]
+            if executor is None:
+                rows = finish(scorable, score_chunk(texts, types))
+                progress.update(len(rows), sum(row['is_spam'] for row in rows), empty)
+                continue
+
+            pending.append((scorable, empty, executor.submit(score_chunk, texts, types)))
+            # Bounded read-ahead keeps every worker busy without buffering the whole input
+            while len(pending) >= 2 * args.workers:
+                scorable, empty, future = pending.popleft()
+                rows = finish(scorable, future.result())
+                progress.update(len(rows), sum(row['is_spam'] for row in rows), empty)
+
+        while pending:
+            scorable, empty, future = pending.popleft()
+            rows = finish(scorable, future.result())
+            progress.update(len(rows), sum(row['is_spam'] for row in rows), empty)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        output.close()
+        progress.report(final=True)
+
+if __name__ == '__main__':
+    main()
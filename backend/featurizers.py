@@ -0,0 +1,65 @@
+"""Hashing-based TF-IDF featurizer for the ``FEATURIZER=hashing`` training mode.
+
+Unlike ``TfidfVectorizer`` it keeps no vocabulary: tokens are hashed into a fixed
+number of columns, so memory does not grow with the corpus and the fitted object
+is small enough to share between workers. The IDF weights are estimated from a
+stream of chunks through ``partial_fit`` and use the same smoothed formula as
+scikit-learn, so the output matches TF-IDF up to hash collisions.
+"""
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+class HashingTfidfVectorizer:
+    def __init__(self, n_features=2 ** 18, ngram_range=(1, 2), use_idf=True):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.use_idf = use_idf
+        self.document_count = 0
+        self.document_frequency = np.zeros(n_features, dtype=np.int64) if use_idf else None
+        self.idf_ = None
+        self._hasher = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=self.ngram_range,
+            alternate_sign=False,
+            norm=None
+        )
+
+    def partial_fit(self, texts):
+        """Add one chunk of documents to the document-frequency estimate."""
+        if not self.use_idf:
+            return self
+        counts = self._hasher.transform(texts)
+        # Each stored entry of a CSR row is a distinct column, so this counts documents per column
+        self.document_frequency += np.bincount(counts.indices, minlength=self.n_features)
+        self.document_count += counts.shape[0]
+        self.idf_ = None
+        return self
+
+    def fit(self, texts):
+        self.document_count = 0
+        if self.use_idf:
+            self.document_frequency[:] = 0
+        return self.partial_fit(texts)
+
+    def _get_idf(self):
+        if self.idf_ is None:
+            self.idf_ = np.log((1 + self.document_count) / (1 + self.document_frequency)) + 1
+        return self.idf_
+
+    def transform(self, texts):
+        X = self._hasher.transform(texts)
+        if self.use_idf:
+            X.data *= self._get_idf()[X.indices]
+        return normalize(X, norm='l2', copy=False)
+
+    def fit_transform(self, texts):
+        return self.fit(texts).transform(texts)
+
+    def __getstate__(self):
+        # Only the IDF weights are needed to transform; drop the raw counts when pickling
+        state = self.__dict__.copy()
+        if self.use_idf:
+            state['idf_'] = self._get_idf()
+            state['document_frequency'] = None
+        return state
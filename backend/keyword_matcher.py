@@ -0,0 +1,82 @@
+"""Aho-Corasick multi-pattern matcher used by the rule-based spam indicators.
+
+The automaton is built once from all keyword categories of a language and then
+finds every occurrence of every pattern in a single pass over the text, so the
+cost per message depends on the text length rather than the number of keywords.
+"""
+from collections import deque
+
+class KeywordMatcher:
+    def __init__(self, categories):
+        """Build the automaton from ``{category: [pattern, ...]}``.
+
+        Patterns are matched as plain substrings; callers lowercase both the
+        patterns and the text. A pattern listed twice in a category counts twice,
+        mirroring the substring loop this replaces.
+        """
+        self.categories = list(categories)
+        self._goto = [{}]
+        self._fail = [0]
+        # Patterns ending at a node: {category: count}
+        self._ends = [None]
+
+        for category, patterns in categories.items():
+            for pattern in patterns:
+                if pattern:
+                    self._add(pattern, category)
+        self._build_failure_links()
+
+    def _add(self, pattern, category):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._ends.append(None)
+            node = next_node
+        if self._ends[node] is None:
+            self._ends[node] = {}
+        self._ends[node][category] = self._ends[node].get(category, 0) + 1
+
+    def _build_failure_links(self):
+        # For every node, the pattern-end nodes that are suffixes of its path
+        self._matches = [()] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        for child in self._goto[0].values():
+            self._matches[child] = (child,) if self._ends[child] else ()
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+
+                inherited = self._matches[self._fail[child]]
+                self._matches[child] = ((child,) + inherited) if self._ends[child] else inherited
+                queue.append(child)
+
+    def find(self, text):
+        """Return the distinct pattern-end nodes found anywhere in ``text``."""
+        goto, fail, matches = self._goto, self._fail, self._matches
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if matches[node]:
+                found.update(matches[node])
+        return found
+
+    def count(self, text):
+        """Return ``{category: number of that category's patterns present in text}``."""
+        counts = dict.fromkeys(self.categories, 0)
+        for node in self.find(text):
+            for category, hits in self._ends[node].items():
+                counts[category] += hits
+        return counts
@@ -0,0 +1,228 @@
+"""Language detection by Unicode script plus character trigram profiles.
+
+Each language is described by a JSON file in ``language_profiles/``:
+
+* a script profile lists Unicode ``ranges`` and a ``min_share``; the language is
+  chosen when at least that share of the letters falls in its ranges (Bangla:
+  any text that is 10% Bengali, the rest typically being brand names and URLs);
+* an n-gram profile lists log-probabilities of the most frequent character
+  trigrams of lowercased, space-padded words, plus the log-probability used for
+  trigrams outside the list. Texts not claimed by a script are scored against
+  every n-gram profile and the most likely language wins.
+
+The lowercased text is split on whitespace and each distinct token is
+classified once: its letter counts per script and per-language trigram
+log-likelihoods are cached, so detecting a message costs one dictionary lookup
+per token and a column sum, with no regex or per-character work once the
+vocabulary of the traffic has been seen. Adding a
+language means dropping another profile into the directory; ``python
+language_detector.py build`` generates one from sample text.
+"""
+import argparse
+import bisect
+import csv
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'language_profiles')
+
+# Runs of letters; digits, punctuation and marks separate words
+WORD_RE = re.compile(r'[^\W\d_]+')
+
+# Latin letters including the accented ones of Western European languages
+LATIN_RANGES = [(0x41, 0x5A), (0x61, 0x7A), (0xC0, 0x24F)]
+
+NGRAM_SIZE = 3
+
+def word_ngrams(word):
+    padded = f' {word} '
+    return [padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)]
+
+def words(text):
+    """Letter runs of lowercased text; digits, punctuation and marks separate words."""
+    text = text.lower()
+    # Decomposed accents would otherwise split words at the combining mark
+    return WORD_RE.findall(text if text.isascii() else unicodedata.normalize('NFC', text))
+
+def parse_ranges(ranges):
+    """Accept ``["0980-09FF", ...]`` or ``[[start, end], ...]`` and return sorted (start, end) code points."""
+    parsed = []
+    for entry in ranges:
+        if isinstance(entry, str):
+            start, _, end = entry.partition('-')
+            parsed.append((int(start, 16), int(end or start, 16)))
+        else:
+            parsed.append((int(entry[0]), int(entry[1])))
+    return sorted(parsed)
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class LanguageDetector:
+    # Script of words scored against the n-gram profiles
+    NGRAM = -1
+
+    def __init__(self, profiles, default='english', cache_size=50000):
+        """Build a detector from profile dicts (see the module docstring for the format)."""
+        self.default = default
+        self.cache_size = cache_size
+        self._cache = {}
+        # Changes whenever a profile does, e.g. to tell when training data must be re-split by language
+        self.signature = hashlib.sha256(
+            json.dumps(sorted(profiles, key=lambda p: p['language']), sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+        self.script_languages = []
+        self.ngram_languages = []
+        self._ngram_tables = []
+        self._unseen = []
+        ngram_ranges = []
+        for profile in sorted(profiles, key=lambda p: p['language']):
+            if profile.get('ngrams'):
+                self.ngram_languages.append(profile['language'])
+                self._ngram_tables.append(profile['ngrams'])
+                self._unseen.append(float(profile['unseen']))
+                ngram_ranges.extend(parse_ranges(profile.get('ranges') or LATIN_RANGES))
+            else:
+                self.script_languages.append((profile['language'], parse_ranges(profile['ranges']), float(profile.get('min_share', 0.5))))
+
+        # Script of a code point: an index into script_languages, or NGRAM
+        boundaries = [(start, end, i) for i, (_, ranges, _) in enumerate(self.script_languages) for start, end in ranges]
+        boundaries += [(start, end, self.NGRAM) for start, end in merge_ranges(ngram_ranges)]
+        boundaries.sort()
+        self._starts = [start for start, _, _ in boundaries]
+        self._boundaries = boundaries
+
+    @classmethod
+    def from_directory(cls, path=DEFAULT_PROFILE_DIR, **kwargs):
+        profiles = []
+        for filename in sorted(glob.glob(os.path.join(path, '*.json'))):
+            with open(filename, encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        if not profiles:
+            raise ValueError(f"No language profiles in {path}")
+        return cls(profiles, **kwargs)
+
+    @property
+    def languages(self):
+        return sorted([language for language, _, _ in self.script_languages] + self.ngram_languages)
+
+    def _script(self, char):
+        code = ord(char)
+        i = bisect.bisect_right(self._starts, code) - 1
+        if i >= 0:
+            start, end, script = self._boundaries[i]
+            if code <= end:
+                return script
+        return None
+
+    def _classify_token(self, token):
+        """Cache and return the token's counts: (letters, letters scored by n-grams, letters per script language, log-likelihood per n-gram language)."""
+        counts = [0] * (2 + len(self.script_languages)) + [0.0] * len(self.ngram_languages)
+        offset = 2 + len(self.script_languages)
+        for word in words(token):
+            script = self._script(word[0])
+            counts[0] += len(word)
+            if script == self.NGRAM:
+                counts[1] += len(word)
+                ngrams = word_ngrams(word)
+                for i, (table, unseen) in enumerate(zip(self._ngram_tables, self._unseen)):
+                    counts[offset + i] += sum(table.get(ngram, unseen) for ngram in ngrams)
+            elif script is not None:
+                counts[2 + script] += len(word)
+
+        entry = tuple(counts)
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[token] = entry
+        return entry
+
+    def detect(self, text):
+        """Return (language, confidence in [0, 1]); the default language with 0.0 when there is nothing to go on."""
+        tokens = text.lower().split()
+        entries = list(map(self._cache.get, tokens))
+        if None in entries:
+            entries = [entry or self._classify_token(token) for token, entry in zip(tokens, entries)]
+        # Column sums of the cached per-token counts, without a Python-level loop per token
+        totals = list(map(sum, zip(*entries)))
+        if not totals or not totals[0]:
+            return self.default, 0.0
+
+        total_letters, scored_letters = totals[0], totals[1]
+        offset = 2 + len(self.script_languages)
+        best_share, best_language = 0.0, None
+        for (language, _, min_share), letters in zip(self.script_languages, totals[2:offset]):
+            share = letters / total_letters
+            if share >= min_share and share > best_share:
+                best_share, best_language = share, language
+        if best_language is not None:
+            return best_language, best_share
+
+        if not scored_letters:
+            return self.default, 0.0
+        scores = totals[offset:]
+        top = max(scores)
+        weights = [math.exp(score - top) for score in scores]
+        best = scores.index(top)
+        return self.ngram_languages[best], weights[best] / sum(weights) * scored_letters / total_letters
+
+def build_profile(language, texts, top=300):
+    """Return an n-gram profile dict from sample texts of one language."""
+    counts = Counter()
+    for text in texts:
+        for word in words(text):
+            counts.update(word_ngrams(word))
+    total = sum(counts.values())
+    if not total:
+        raise ValueError(f"No words found in the {language} samples")
+    kept = counts.most_common(top)
+    return {
+        'language': language,
+        'ranges': [f"{start:04X}-{end:04X}" for start, end in LATIN_RANGES],
+        'ngrams': {ngram: round(math.log(count / total), 4) for ngram, count in kept},
+        # Half the probability of the rarest kept trigram, so an unlisted trigram always costs more
+        'unseen': round(math.log(kept[-1][1] / total / 2), 4)
+    }
+
+def read_texts(source, column, encoding):
+    """Read samples from ``file.txt`` (one per line), ``file.csv`` (``column``) or ``file.csv:column``."""
+    path, _, source_column = source.rpartition(':') if '.csv:' in source else (source, None, None)
+    column = source_column or column
+    if path.endswith('.csv'):
+        with open(path, encoding=encoding, errors='replace', newline='') as f:
+            return [row[column] for row in csv.DictReader(f) if row.get(column)]
+    with open(path, encoding=encoding, errors='replace') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description='Build an n-gram language profile from sample texts.')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('language')
+    parser.add_argument('inputs', nargs='+', help='text files (one sample per line), CSV files or file.csv:column')
+    parser.add_argument('--column', default='text', help='CSV column holding the text when not given per file')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--top', type=int, default=300, help='trigrams kept in the profile')
+    parser.add_argument('--output', help=f"default: {DEFAULT_PROFILE_DIR}/<language>.json")
+    args = parser.parse_args()
+
+    texts = [text for path in args.inputs for text in read_texts(path, args.column, args.encoding)]
+    profile = build_profile(args.language, texts, args.top)
+    output = args.output or os.path.join(DEFAULT_PROFILE_DIR, f'{args.language}.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=1)
+    print(f"Wrote {len(profile['ngrams'])} trigrams from {len(texts)} samples to {output}")
+
+if __name__ == '__main__':
+    main()
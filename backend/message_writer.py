@@ -0,0 +1,284 @@
+"""Write-behind persistence for scored messages.
+
+Endpoints enqueue rows and return immediately; a background thread drains the
+queue and inserts up to ``batch_size`` rows per multi-row statement. The queue
+is bounded: when it is full, ``enqueue`` blocks for ``put_timeout`` seconds and
+then appends the row to a JSON-lines spill file, so a stalled database slows
+producers down without growing memory or losing rows. Failed flushes are retried
+with backoff, and rows that still cannot be written when the process shuts down
+are spilled too; once one batch has been given up at shutdown, the rest go
+straight to the spill file. The writer thread replays the spill file when it
+starts, and again after the next successful flush once rows have overflowed.
+
+Errors listed in ``permanent_errors`` (bad data, constraint violations) would
+fail on every retry, so the batch is retried one row at a time instead and the
+rows that still fail are appended to a dead-letter file rather than holding up
+the queue.
+"""
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class MessageWriter:
+    def __init__(self, get_connection, insert_rows, batch_size=500, flush_interval=0.05,
+                 max_queue=10000, put_timeout=1.0, spill_path=None, max_retries=5,
+                 permanent_errors=(ValueError,), dead_letter_path=None):
+        """``insert_rows(cursor, rows)`` inserts a list of row dicts and returns their ids in order.
+
+        It should be idempotent per row ``uuid``: a batch whose commit was not
+        acknowledged, or a spill file only partly replayed, is written again.
+        """
+        self.get_connection = get_connection
+        self.insert_rows = insert_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.spill_path = spill_path
+        self.max_retries = max_retries
+        self.permanent_errors = tuple(permanent_errors)
+        self.dead_letter_path = dead_letter_path
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        # Set when rows overflow to the spill file, so the writer replays it once the database keeps up again
+        self._spilled = threading.Event()
+        self._closing = threading.Event()
+        # Set at shutdown once a batch was spilled after max_retries, so the rest do not wait out the same outage
+        self._gave_up = threading.Event()
+        self.stats_counters = {'enqueued': 0, 'written': 0, 'rejected': 0, 'batches': 0, 'retries': 0, 'spilled': 0, 'replayed': 0, 'dead_lettered': 0}
+
+    def start(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, row, on_saved=None):
+        """Queue a row (which must carry a ``uuid``); returns False only if it could be neither queued nor spilled.
+
+        A row that overflows to the spill file is written when the file is
+        replayed, without ``on_saved`` being called.
+        """
+        self.start()
+        with self._pending_lock:
+            self._pending.add(row['uuid'])
+        try:
+            self._queue.put((row, on_saved), timeout=self.put_timeout)
+        except queue.Full:
+            if not self._spill([row]):
+                self.stats_counters['rejected'] += 1
+                return False
+            self._spilled.set()
+            return True
+        self.stats_counters['enqueued'] += 1
+        return True
+
+    def is_pending(self, row_uuid):
+        with self._pending_lock:
+            return row_uuid in self._pending
+
+    def _run(self):
+        self._replay_spill(leftovers=True)
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # close() could not queue the stop marker behind a full queue; stop once it has drained
+                if self._closing.is_set():
+                    break
+                continue
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            # The flush went through, so the database can take the overflow again
+            if self._spilled.is_set() and not stopping:
+                self._replay_spill()
+
+        # Drain whatever was queued behind the stop marker
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            self._flush(remaining[start:start + self.batch_size])
+
+    def _flush(self, batch):
+        """Write a batch, retrying transient errors; returns the number of rows written."""
+        rows = [row for row, _ in batch]
+        attempt = 0
+        while True:
+            try:
+                ids = self._write(rows)
+                break
+            except self.permanent_errors as e:
+                if len(batch) > 1:
+                    # Find the offending rows so the rest of the batch still gets written
+                    logger.warning(f"Write-behind batch of {len(rows)} messages rejected ({e}); retrying row by row")
+                    return sum(self._flush([item]) for item in batch)
+                self._dead_letter(rows, e)
+                return 0
+            except Exception as e:
+                attempt += 1
+                self.stats_counters['retries'] += 1
+                logger.error(f"Write-behind flush of {len(rows)} messages failed (attempt {attempt}): {e}")
+                # While running, keep retrying rather than dropping rows; on shutdown, give up to the spill file
+                if self._closing.is_set() and (attempt > self.max_retries or self._gave_up.is_set()):
+                    self._gave_up.set()
+                    self._spill(rows)
+                    return 0
+                time.sleep(min(0.1 * 2 ** attempt, 1 if self._closing.is_set() else 5))
+
+        self.stats_counters['written'] += len(rows)
+        self.stats_counters['batches'] += 1
+        with self._pending_lock:
+            self._pending.difference_update(row['uuid'] for row in rows)
+        for (row, on_saved), row_id in zip(batch, ids):
+            if on_saved is not None:
+                try:
+                    on_saved(row, row_id)
+                except Exception as e:
+                    logger.error(f"Write-behind callback failed: {e}")
+        return len(rows)
+
+    def _write(self, rows):
+        conn = self.get_connection()
+        if not conn:
+            raise RuntimeError("database unavailable")
+        try:
+            cursor = conn.cursor()
+            ids = self.insert_rows(cursor, rows)
+            conn.commit()
+            cursor.close()
+            return ids
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _spill(self, rows):
+        """Append rows to the spill file; returns False if they had to be dropped."""
+        with self._pending_lock:
+            self._pending.difference_update(row['uuid'] for row in rows)
+        if not self.spill_path:
+            logger.error(f"Dropped {len(rows)} messages: database unavailable and no spill file configured")
+            return False
+        try:
+            with self._spill_lock, open(self.spill_path, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + '\n')
+        except OSError as e:
+            logger.error(f"Dropped {len(rows)} messages: could not write {self.spill_path}: {e}")
+            return False
+        self.stats_counters['spilled'] += len(rows)
+        logger.warning(f"Spilled {len(rows)} unsaved messages to {self.spill_path}")
+        return True
+
+    def _dead_letter(self, rows, error):
+        """Set aside rows the database refuses; they are kept for inspection, not replayed."""
+        with self._pending_lock:
+            self._pending.difference_update(row['uuid'] for row in rows)
+        self.stats_counters['dead_lettered'] += len(rows)
+        if not self.dead_letter_path:
+            logger.error(f"Dropped {len(rows)} messages the database rejected: {error}")
+            return
+        try:
+            with self._spill_lock, open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps({'error': str(error), 'row': row}, default=str) + '\n')
+        except OSError as e:
+            logger.error(f"Dropped {len(rows)} rejected messages: could not write {self.dead_letter_path}: {e}")
+            return
+        logger.error(f"Moved {len(rows)} messages the database rejected to {self.dead_letter_path}: {error}")
+
+    def _replay_spill(self, leftovers=False):
+        """Write the rows of the spill file on the writer thread, ahead of newly queued ones.
+
+        With ``leftovers``, files claimed by a replay that never finished (the
+        worker died) are replayed too; rows already written are skipped by the
+        idempotent insert.
+        """
+        self._spilled.clear()
+        if not self.spill_path:
+            return
+        sources = [self.spill_path]
+        if leftovers:
+            sources += sorted(glob.glob(f"{glob.escape(self.spill_path)}.*.claimed"))
+        for source in sources:
+            # Claim the file first so concurrent workers do not replay it twice; rows spilled from now on start a new file
+            claimed = f"{self.spill_path}.{uuid.uuid4().hex}.claimed"
+            try:
+                with self._spill_lock:
+                    os.replace(source, claimed)
+            except OSError:
+                # Gone already: nothing was spilled, or another worker claimed it first
+                continue
+            with open(claimed, encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            logger.info(f"Replaying {len(rows)} messages from {source}")
+            with self._pending_lock:
+                self._pending.update(row['uuid'] for row in rows)
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                self.stats_counters['replayed'] += self._flush([(row, None) for row in batch])
+            try:
+                os.remove(claimed)
+            except FileNotFoundError:
+                # A worker starting meanwhile took it for a leftover and replays it as well
+                pass
+
+    def close(self, timeout=60):
+        """Flush everything still queued, spilling what the database will not take."""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        self._closing.set()
+        try:
+            # Wakes the writer at once; with a full queue it stops by itself once the queue is empty
+            self._queue.put(_STOP, timeout=self.put_timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Write-behind writer did not drain within {timeout}s")
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'max_queue': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            **self.stats_counters
+        }
@@ -0,0 +1,207 @@
+"""Single-file, memory-mapped model artifacts.
+
+Layout: the magic ``GNXMODEL``, a little-endian uint32 layout version and uint64
+header length, a JSON header, then raw little-endian arrays, each aligned to 64
+bytes. The header holds the training manifest (data hash, hyperparameters,
+metrics, version) and, per language, the featurizer settings plus the dtype,
+shape and offset of every array: the Naive Bayes class priors and feature log
+probabilities, the IDF weights, and the TF-IDF vocabulary as one UTF-8 blob with
+term offsets. Loading maps the file read-only and builds the vectorizers and
+models on views into the mapping, so gunicorn workers share one physical copy
+through the page cache, and nothing is unpickled. A SHA-256 of the array section
+guards against truncated or corrupted files.
+"""
+import hashlib
+import json
+import struct
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+from featurizers import HashingTfidfVectorizer
+
+MAGIC = b'GNXMODEL'
+LAYOUT_VERSION = 1
+PREFIX = struct.Struct('<8sIQ')
+ALIGNMENT = 64
+
+# Only plain numeric arrays are ever read back
+ALLOWED_DTYPES = {'<f8', '<f4', '<i8', '<i4', '|u1'}
+
+# TfidfVectorizer settings that affect transform() and survive a JSON round trip
+TFIDF_PARAMS = (
+    'analyzer', 'binary', 'lowercase', 'max_df', 'max_features', 'min_df', 'ngram_range',
+    'norm', 'smooth_idf', 'strip_accents', 'sublinear_tf', 'token_pattern', 'use_idf'
+)
+
+class ArtifactError(ValueError):
+    pass
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _little_endian(array):
+    array = np.ascontiguousarray(array)
+    return array.astype(array.dtype.newbyteorder('<'), copy=False)
+
+def _describe_model(model, arrays):
+    if not isinstance(model, MultinomialNB):
+        raise ArtifactError(f"Unsupported model type {type(model).__name__}")
+    arrays['classes'] = _little_endian(np.asarray(model.classes_, dtype=np.int64))
+    arrays['class_log_prior'] = _little_endian(np.asarray(model.class_log_prior_, dtype=np.float64))
+    arrays['feature_log_prob'] = _little_endian(np.asarray(model.feature_log_prob_, dtype=np.float64))
+    return {'type': 'multinomial_nb', 'alpha': model.alpha, 'fit_prior': model.fit_prior}
+
+def _describe_vectorizer(vectorizer, arrays):
+    if isinstance(vectorizer, HashingTfidfVectorizer):
+        if vectorizer.use_idf:
+            arrays['idf'] = _little_endian(np.asarray(vectorizer._get_idf(), dtype=np.float64))
+        return {
+            'type': 'hashing_tfidf',
+            'n_features': vectorizer.n_features,
+            'ngram_range': list(vectorizer.ngram_range),
+            'use_idf': vectorizer.use_idf,
+            'document_count': int(vectorizer.document_count)
+        }
+
+    if not isinstance(vectorizer, TfidfVectorizer) or vectorizer.tokenizer or vectorizer.preprocessor \
+            or vectorizer.stop_words or callable(vectorizer.analyzer):
+        raise ArtifactError(f"Unsupported vectorizer {vectorizer!r}")
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    encoded = [term.encode('utf-8') for term in terms]
+    arrays['vocabulary'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    arrays['vocabulary_offsets'] = _little_endian(np.cumsum([0] + [len(term) for term in encoded], dtype=np.int64))
+    if vectorizer.use_idf:
+        arrays['idf'] = _little_endian(np.asarray(vectorizer.idf_, dtype=np.float64))
+    params = vectorizer.get_params()
+    return {
+        'type': 'tfidf',
+        'params': {name: list(params[name]) if name == 'ngram_range' else params[name] for name in TFIDF_PARAMS}
+    }
+
+def write_artifact(f, manifest, models, vectorizers):
+    """Write ``manifest`` and the per-language models/vectorizers to the binary file ``f``."""
+    blobs = []
+    offset = 0
+    languages = {}
+    for language in sorted(models):
+        arrays = {}
+        entry = {
+            'model': _describe_model(models[language], arrays),
+            'vectorizer': _describe_vectorizer(vectorizers[language], arrays),
+            'arrays': {}
+        }
+        for name, array in arrays.items():
+            offset = _align(offset)
+            entry['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            blobs.append((offset, array))
+            offset += array.nbytes
+        languages[language] = entry
+
+    digest = hashlib.sha256()
+    position = 0
+    for start, array in blobs:
+        digest.update(b'\0' * (start - position))
+        digest.update(array.tobytes())
+        position = start + array.nbytes
+
+    header = json.dumps({
+        **manifest,
+        'languages': sorted(languages),
+        'models': languages,
+        'data_size': position,
+        'sha256': digest.hexdigest()
+    }).encode('utf-8')
+    f.write(PREFIX.pack(MAGIC, LAYOUT_VERSION, len(header)))
+    f.write(header)
+    data_start = _align(PREFIX.size + len(header))
+    f.write(b'\0' * (data_start - PREFIX.size - len(header)))
+
+    position = 0
+    for start, array in blobs:
+        f.write(b'\0' * (start - position))
+        f.write(array.tobytes())
+        position = start + array.nbytes
+
+def _read_header(f):
+    prefix = f.read(PREFIX.size)
+    if len(prefix) != PREFIX.size:
+        raise ArtifactError("Truncated model artifact")
+    magic, version, header_length = PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ArtifactError("Not a model artifact")
+    if version != LAYOUT_VERSION:
+        raise ArtifactError(f"Unsupported artifact layout version {version}")
+    header = f.read(header_length)
+    if len(header) != header_length:
+        raise ArtifactError("Truncated model artifact header")
+    return json.loads(header), _align(PREFIX.size + header_length)
+
+def read_manifest(path):
+    """Return the header of an artifact without mapping its arrays."""
+    with open(path, 'rb') as f:
+        return _read_header(f)[0]
+
+def _array(data, spec):
+    dtype = np.dtype(spec['dtype'])
+    if dtype.str not in ALLOWED_DTYPES:
+        raise ArtifactError(f"Unexpected array dtype {spec['dtype']}")
+    count = int(np.prod(spec['shape'], dtype=np.int64))
+    offset = int(spec['offset'])
+    if offset < 0 or offset + count * dtype.itemsize > len(data):
+        raise ArtifactError("Array extends past the end of the artifact")
+    return np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(spec['shape'])
+
+def _build_model(spec, arrays):
+    if spec['type'] != 'multinomial_nb':
+        raise ArtifactError(f"Unknown model type {spec['type']}")
+    model = MultinomialNB(alpha=spec['alpha'], fit_prior=spec['fit_prior'])
+    model.classes_ = arrays['classes']
+    model.class_log_prior_ = arrays['class_log_prior']
+    model.feature_log_prob_ = arrays['feature_log_prob']
+    model.n_features_in_ = model.feature_log_prob_.shape[1]
+    return model
+
+def _build_vectorizer(spec, arrays):
+    if spec['type'] == 'hashing_tfidf':
+        vectorizer = HashingTfidfVectorizer(n_features=spec['n_features'], ngram_range=spec['ngram_range'], use_idf=False)
+        vectorizer.use_idf = spec['use_idf']
+        vectorizer.document_count = spec['document_count']
+        vectorizer.idf_ = arrays.get('idf')
+        return vectorizer
+
+    if spec['type'] != 'tfidf':
+        raise ArtifactError(f"Unknown vectorizer type {spec['type']}")
+    params = dict(spec['params'])
+    params['ngram_range'] = tuple(params['ngram_range'])
+    vectorizer = TfidfVectorizer(**params)
+    blob = arrays['vocabulary'].tobytes()
+    offsets = arrays['vocabulary_offsets']
+    # sklearn needs a dict here; the vocabulary is the only per-worker copy
+    vectorizer.vocabulary_ = {
+        blob[offsets[i]:offsets[i + 1]].decode('utf-8'): i for i in range(len(offsets) - 1)
+    }
+    vectorizer.fixed_vocabulary_ = True
+    if params['use_idf']:
+        vectorizer.idf_ = arrays['idf']
+    return vectorizer
+
+def load_artifact(path, verify=True):
+    """Map an artifact read-only; returns (manifest, models, vectorizers) keyed by language."""
+    with open(path, 'rb') as f:
+        manifest, data_start = _read_header(f)
+
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    data = mapped[data_start:data_start + manifest['data_size']]
+    if len(data) != manifest['data_size']:
+        raise ArtifactError("Truncated model artifact data")
+    if verify and hashlib.sha256(data).hexdigest() != manifest['sha256']:
+        raise ArtifactError("Model artifact checksum mismatch")
+
+    models, vectorizers = {}, {}
+    for language, entry in manifest['models'].items():
+        arrays = {name: _array(data, spec) for name, spec in entry['arrays'].items()}
+        models[language] = _build_model(entry['model'], arrays)
+        vectorizers[language] = _build_vectorizer(entry['vectorizer'], arrays)
+    return manifest, models, vectorizers
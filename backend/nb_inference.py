@@ -0,0 +1,241 @@
+"""Compiled Naive Bayes inference for the served featurizer/model pairs.
+
+Scoring one message through scikit-learn costs a ``transform`` (input
+validation, a sparse matrix for the counts, another for the IDF product) and
+then ``predict`` and ``predict_proba``, which validate again and compute the
+same joint log-likelihood twice. ``compile_predictor`` turns a fitted pair into
+plain arrays once: the vectorizer's own analyzer, a term -> column lookup
+(vocabulary or hash), the IDF weights, the Naive Bayes class priors and feature
+log-probabilities. A message is then counted in a dict and weighted, normalised
+and scored with a handful of NumPy operations; a batch becomes one CSR matrix
+and one sparse dot product.
+
+Floating point results depend on the order of the operations, so every step
+repeats scikit-learn's: columns are stored in the order its transform leaves
+them, sums run sequentially in that order, and the posterior is normalised with
+the same ``logsumexp`` formula as the installed SciPy. Labels and probabilities
+are therefore identical to scikit-learn's, not merely close. Each compiled pair
+is checked against scikit-learn on probe texts; pairs that are unsupported or
+do not match exactly get no predictor and keep using scikit-learn.
+"""
+import logging
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.special import logsumexp
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.utils import murmurhash3_32
+from sklearn.utils.sparsefuncs_fast import inplace_csr_row_normalize_l2
+
+from featurizers import HashingTfidfVectorizer
+
+logger = logging.getLogger(__name__)
+
+# Distinct terms whose hashed column is remembered per hashing predictor
+HASH_CACHE_SIZE = 200000
+
+def _logsumexp_shifted(jll):
+    """SciPy < 1.15: log(sum(exp(a - max))) + max."""
+    a_max = jll.max(axis=1, keepdims=True)
+    return np.log(np.sum(np.exp(jll - a_max), axis=1, keepdims=True)) + a_max
+
+def _logsumexp_separated(jll):
+    """SciPy >= 1.15: the maximal terms are left out of the sum and added back through log1p."""
+    a_max = jll.max(axis=1, keepdims=True)
+    is_max = jll == a_max
+    m = np.sum(is_max, axis=1, keepdims=True, dtype=jll.dtype)
+    s = np.sum(np.exp(np.where(is_max, -np.inf, jll) - a_max), axis=1, keepdims=True)
+    s = np.where(s == 0, s, s / m)
+    return np.log1p(s) + np.log(m) + a_max
+
+def _logsumexp_scipy(jll):
+    return logsumexp(jll, axis=1)[:, None]
+
+def _select_logsumexp():
+    """Return the NumPy formula that reproduces the installed SciPy exactly, or SciPy itself."""
+    rng = np.random.default_rng(0)
+    probes = [rng.normal(scale=scale, size=(64, classes)) for scale in (1, 30, 300) for classes in (2, 3)]
+    probes.append(np.array([[-5.0, -5.0], [0.0, -1e-12], [-700.0, 0.0], [-3.5, -1e3]]))
+    for candidate in (_logsumexp_separated, _logsumexp_shifted):
+        if all(np.array_equal(candidate(a), _logsumexp_scipy(a)) for a in probes):
+            return candidate
+    return _logsumexp_scipy
+
+_logsumexp = _select_logsumexp()
+
+def _hashed_column(n_features):
+    """Term -> column as computed by sklearn's FeatureHasher (seed 0), with a bounded cache."""
+    cache = {}
+
+    def column(term):
+        index = cache.get(term)
+        if index is None:
+            h = murmurhash3_32(term, seed=0)
+            # abs(-2**31) overflows in sklearn's int32 arithmetic; this is its special case
+            index = (2147483647 - (n_features - 1)) % n_features if h == -2147483648 else abs(h) % n_features
+            if len(cache) >= HASH_CACHE_SIZE:
+                cache.clear()
+            cache[term] = index
+        return index
+    return column
+
+class CompiledNB:
+    """A featurizer and MultinomialNB pair reduced to arrays; build it with ``compile_predictor``."""
+
+    def __init__(self, analyzer, column, n_features, model, idf=None, binary=False,
+                 sublinear_tf=False, normalize=True, descending=False):
+        self.analyzer = analyzer
+        self.column = column
+        self.n_features = n_features
+        self.idf = idf
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+        self.normalize = normalize
+        # sklearn's TF-IDF product leaves each row's columns in descending order
+        self.descending = descending
+        self.classes = model.classes_
+        self.class_log_prior = model.class_log_prior_
+        self.feature_log_prob = model.feature_log_prob_
+        # (n_features, n_classes) in C order: what the sparse dot product reads without copying
+        self._feature_log_prob_t = np.ascontiguousarray(model.feature_log_prob_.T)
+
+    def _columns(self, text):
+        counts = {}
+        for term, count in Counter(self.analyzer(text)).items():
+            j = self.column(term)
+            if j is not None:
+                counts[j] = counts.get(j, 0) + count
+        return counts
+
+    def _weight(self, data, indices):
+        """Counts -> TF-IDF in place, before normalisation."""
+        if self.binary:
+            data.fill(1)
+        if self.sublinear_tf:
+            np.log(data, out=data)
+            data += 1
+        if self.idf is not None:
+            data *= self.idf[indices]
+
+    def transform_row(self, text):
+        """Return the normalised feature row of one text as (column indices, values)."""
+        counts = self._columns(text)
+        indices = np.array(sorted(counts, reverse=self.descending), dtype=np.intp)
+        data = np.array([counts[j] for j in indices.tolist()], dtype=np.float64)
+        self._weight(data, indices)
+        if self.normalize and len(data):
+            # Sequential sum in stored order, like sklearn's row normalisation
+            norm = np.sqrt(np.cumsum(data * data)[-1])
+            if norm != 0:
+                data /= norm
+        return indices, data
+
+    def predict_row(self, row):
+        """Return (label, class probabilities) for a row from ``transform_row``."""
+        indices, data = row
+        jll = np.zeros(len(self.classes))
+        if len(indices):
+            # One running sum per class over the row's columns, in the order the CSR kernel adds them
+            jll = jll + np.cumsum(self.feature_log_prob[:, indices] * data, axis=1)[:, -1]
+        labels, probabilities = self._posteriors((jll + self.class_log_prior)[None, :])
+        return labels[0], probabilities[0]
+
+    def transform(self, texts):
+        """Return the normalised CSR feature matrix of ``texts``."""
+        indptr = [0]
+        indices, counts = [], []
+        for text in texts:
+            row = self._columns(text)
+            columns = sorted(row, reverse=self.descending)
+            indices.extend(columns)
+            counts.extend(row[j] for j in columns)
+            indptr.append(len(indices))
+        indices = np.array(indices, dtype=np.int32)
+        data = np.array(counts, dtype=np.float64)
+        self._weight(data, indices)
+        X = sp.csr_matrix((data, indices, np.array(indptr, dtype=np.int32)), shape=(len(indptr) - 1, self.n_features))
+        if self.normalize:
+            inplace_csr_row_normalize_l2(X)
+        return X
+
+    def predict(self, X):
+        """Return (labels, class probabilities) for a matrix from ``transform``."""
+        return self._posteriors(X @ self._feature_log_prob_t + self.class_log_prior)
+
+    def _posteriors(self, jll):
+        return self.classes[jll.argmax(axis=1)], np.exp(jll - _logsumexp(jll))
+
+def _build(model, vectorizer):
+    """Return (CompiledNB, reason): the predictor, or None and why the pair is not supported."""
+    if type(model) is not MultinomialNB:
+        return None, f"model {type(model).__name__}"
+    if isinstance(vectorizer, HashingTfidfVectorizer):
+        idf = vectorizer._get_idf() if vectorizer.use_idf else None
+        hasher = vectorizer._hasher
+        return CompiledNB(
+            hasher.build_analyzer(), _hashed_column(vectorizer.n_features), vectorizer.n_features, model, idf=idf
+        ), None
+    if type(vectorizer) is HashingVectorizer:
+        if vectorizer.alternate_sign or vectorizer.norm not in ('l2', None) or vectorizer.dtype != np.float64:
+            return None, "HashingVectorizer settings"
+        return CompiledNB(
+            vectorizer.build_analyzer(), _hashed_column(vectorizer.n_features), vectorizer.n_features, model,
+            binary=vectorizer.binary, normalize=vectorizer.norm == 'l2'
+        ), None
+    if type(vectorizer) is TfidfVectorizer:
+        if vectorizer.norm not in ('l2', None) or vectorizer.dtype != np.float64:
+            return None, "TfidfVectorizer settings"
+        return CompiledNB(
+            vectorizer.build_analyzer(), vectorizer.vocabulary_.get, len(vectorizer.vocabulary_), model,
+            idf=np.asarray(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf else None,
+            binary=vectorizer.binary, sublinear_tf=vectorizer.sublinear_tf, normalize=vectorizer.norm == 'l2'
+        ), None
+    return None, f"vectorizer {type(vectorizer).__name__}"
+
+def _probe_texts(vectorizer, texts):
+    probes = [text for text in texts if text and text.strip()]
+    vocabulary = getattr(vectorizer, 'vocabulary_', None)
+    if vocabulary:
+        words = sorted((term for term in vocabulary if ' ' not in term), key=vocabulary.get)[:120]
+        # Runs of known words, some repeated, so rows have several columns with counts above one
+        probes += [' '.join(words[i:i + size] + words[i:i + size // 2]) for size in (1, 3, 8) for i in range(0, len(words), 20)]
+    probes.append(' '.join(probes))
+    return probes + ['zzqxj']
+
+def compile_predictor(model, vectorizer, probe_texts=()):
+    """Compile a fitted featurizer/MultinomialNB pair, or return None to keep it on scikit-learn.
+
+    The predictor is only returned when it reproduces ``vectorizer.transform``
+    followed by ``model.predict`` and ``model.predict_proba`` exactly on
+    ``probe_texts`` plus some texts made from the vocabulary.
+    """
+    try:
+        predictor, reason = _build(model, vectorizer)
+        if predictor is None:
+            logger.info(f"No compiled inference for {reason}; using scikit-learn")
+            return None
+
+        probes = _probe_texts(vectorizer, probe_texts)
+        X = vectorizer.transform(probes)
+        if predictor.idf is not None and type(vectorizer) is TfidfVectorizer:
+            # Whether this sklearn stores TF-IDF rows in descending column order
+            longest = X[int(np.diff(X.indptr).argmax())]
+            predictor.descending = len(longest.indices) > 1 and longest.indices[0] > longest.indices[1]
+
+        labels, probabilities = model.predict(X), model.predict_proba(X)
+        batch_labels, batch_probabilities = predictor.predict(predictor.transform(probes))
+        rows = [predictor.predict_row(predictor.transform_row(text)) for text in probes]
+        matches = (
+            np.array_equal(labels, batch_labels) and np.array_equal(probabilities, batch_probabilities)
+            and np.array_equal(labels, [label for label, _ in rows])
+            and np.array_equal(probabilities, [row for _, row in rows])
+        )
+        if not matches:
+            logger.warning("Compiled inference differs from scikit-learn; using scikit-learn")
+            return None
+        return predictor
+    except Exception as e:
+        logger.warning(f"Could not compile inference: {e}")
+        return None
@@ -0,0 +1,147 @@
+"""MinHash + LSH index of recent messages for near-duplicate campaign detection.
+
+Messages inside one campaign differ only in names, amounts or phone numbers, so
+they are compared on character shingles of the normalized text with digit runs
+collapsed. Each message gets a MinHash signature; signatures are split into
+bands and bucketed so candidate near-duplicates are found without scanning the
+index. Entries are evicted by age and by a size bound, and each entry carries a
+campaign cluster id: the id of the first message seen in that cluster.
+"""
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+DIGITS_RE = re.compile(r'\d+')
+MERSENNE_PRIME = (1 << 31) - 1
+
+class NearDuplicateIndex:
+    def __init__(self, num_perm=64, bands=16, threshold=0.8, max_entries=100000, ttl=7 * 86400, shingle_size=5, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shingle_size = shingle_size
+
+        # Fixed seed so signatures agree across workers and restarts
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+
+        # entry id -> (timestamp, signature, is_spam, confidence, cluster id), oldest first
+        self._entries = OrderedDict()
+        self._buckets = [dict() for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.matches = 0
+
+    def _shingles(self, text):
+        text = DIGITS_RE.sub('#', text)
+        if len(text) <= self.shingle_size:
+            return {text}
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in self._shingles(text)),
+            dtype=np.uint64
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, signature):
+        """Return the most similar indexed entry above the threshold, or None."""
+        with self._lock:
+            self.queries += 1
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(key, ()))
+
+            best = None
+            for entry_id in candidates:
+                _, other, is_spam, confidence, cluster_id = self._entries[entry_id]
+                similarity = float(np.count_nonzero(other == signature)) / self.num_perm
+                if similarity >= self.threshold and (best is None or similarity > best['similarity']):
+                    best = {
+                        'id': entry_id,
+                        'cluster_id': cluster_id,
+                        'similarity': similarity,
+                        'is_spam': is_spam,
+                        'confidence': confidence
+                    }
+            if best:
+                self.matches += 1
+            return best
+
+    def add(self, entry_id, signature, is_spam, confidence, cluster_id=None, timestamp=None):
+        """Index an entry; it joins ``cluster_id`` or starts its own cluster. Returns the cluster id."""
+        timestamp = time.time() if timestamp is None else timestamp
+        cluster_id = entry_id if cluster_id is None else cluster_id
+        with self._lock:
+            if entry_id in self._entries:
+                self._remove(entry_id)
+            self._entries[entry_id] = (timestamp, signature, is_spam, confidence, cluster_id)
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(key, set()).add(entry_id)
+            self._evict(time.time())
+        return cluster_id
+
+    def remove(self, entry_id):
+        with self._lock:
+            if entry_id in self._entries:
+                self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        _, signature, _, _, _ = self._entries.pop(entry_id)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            members = bucket.get(key)
+            if members is not None:
+                members.discard(entry_id)
+                if not members:
+                    del bucket[key]
+
+    def _evict(self, now):
+        while self._entries:
+            oldest_id, (timestamp, *_rest) = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_entries or timestamp < now - self.ttl:
+                self._remove(oldest_id)
+            else:
+                break
+
+    def relabel(self, entry_id, is_spam):
+        """Apply an admin-confirmed label, which then carries full confidence."""
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry:
+                self._entries[entry_id] = (entry[0], entry[1], is_spam, 1.0, entry[4])
+
+    def cluster_of(self, entry_id):
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            return entry[4] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for bucket in self._buckets:
+                bucket.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'threshold': self.threshold,
+            'queries': self.queries,
+            'matches': self.matches
+        }
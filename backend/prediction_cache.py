@@ -0,0 +1,124 @@
+"""Prediction result caches.
+
+``PredictionCache`` is an in-process LRU with a TTL and a size bound.
+``RedisPredictionCache`` shares results between workers and hosts when the
+optional ``redis`` package is installed and ``PREDICTION_CACHE_URL`` is set.
+Both expose the same ``get``/``set``/``delete``/``clear``/``stats`` interface.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+class PredictionCache:
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        if self.maxsize <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'size': len(self._entries),
+            'max_size': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+        }
+
+class RedisPredictionCache:
+    """Shared cache; keys already embed the model version, so stale entries simply stop matching."""
+
+    def __init__(self, url, ttl=300, prefix='guardnex:prediction:'):
+        if redis is None:
+            raise ImportError("The redis package is required for PREDICTION_CACHE_URL")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            self.errors += 1
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        try:
+            self.client.setex(self.prefix + key, self.ttl, json.dumps(value))
+        except Exception:
+            self.errors += 1
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception:
+            self.errors += 1
+
+    def clear(self):
+        # Entries expire on their own and old model versions never match again
+        pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'redis',
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+        }
@@ -0,0 +1,153 @@
+"""MessageWriter against a stub connection; run from backend/ with ``python -m pytest tests``."""
+import json
+import threading
+import time
+import uuid
+
+import pytest
+
+from message_writer import MessageWriter
+
+class StubDatabase:
+    """Stores rows by uuid like the messages table; NUL in content is rejected as psycopg2 does."""
+
+    def __init__(self):
+        self.rows = {}
+        self.up = True
+        self.lock = threading.Lock()
+
+    def connect(self):
+        return StubConnection(self) if self.up else None
+
+    def insert(self, cursor, rows):
+        for row in rows:
+            if '\x00' in row['content']:
+                raise ValueError("A string literal cannot contain NUL (0x00) characters.")
+        with self.lock:
+            for row in rows:
+                self.rows.setdefault(row['uuid'], len(self.rows) + 1)
+            return [self.rows[row['uuid']] for row in rows]
+
+class StubConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def make_row(content='hello'):
+    return {'uuid': str(uuid.uuid4()), 'content': content}
+
+def make_writer(db, tmp_path, **kwargs):
+    options = {
+        'batch_size': 10, 'flush_interval': 0.01, 'put_timeout': 0.01, 'max_retries': 1,
+        'spill_path': str(tmp_path / 'pending.jsonl'), 'dead_letter_path': str(tmp_path / 'rejected.jsonl'),
+    }
+    options.update(kwargs)
+    return MessageWriter(db.connect, db.insert, **options)
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def test_writes_rows_and_reports_ids(tmp_path):
+    db = StubDatabase()
+    writer = make_writer(db, tmp_path)
+    saved = {}
+    rows = [make_row() for _ in range(25)]
+    for row in rows:
+        assert writer.enqueue(row, on_saved=lambda row, row_id: saved.__setitem__(row['uuid'], row_id))
+
+    assert wait_for(lambda: len(saved) == len(rows))
+    assert saved == {row['uuid']: db.rows[row['uuid']] for row in rows}
+    assert not any(writer.is_pending(row['uuid']) for row in rows)
+    writer.close()
+
+def test_rejected_row_is_dead_lettered_and_the_rest_written(tmp_path):
+    db = StubDatabase()
+    writer = make_writer(db, tmp_path)
+    bad = make_row('bad\x00row')
+    good = [make_row() for _ in range(20)]
+    for row in good[:10] + [bad] + good[10:]:
+        assert writer.enqueue(row)
+
+    assert wait_for(lambda: len(db.rows) == len(good))
+    writer.close()
+    assert writer.stats()['dead_lettered'] == 1
+    assert writer.stats()['rejected'] == 0
+    assert [entry['row']['uuid'] for entry in read_jsonl(tmp_path / 'rejected.jsonl')] == [bad['uuid']]
+    assert not writer.is_pending(bad['uuid'])
+
+def test_overflow_is_spilled_and_replayed_once_the_database_is_back(tmp_path):
+    db = StubDatabase()
+    db.up = False
+    writer = make_writer(db, tmp_path, max_queue=3)
+    rows = [make_row() for _ in range(20)]
+    assert all(writer.enqueue(row) for row in rows)
+    assert writer.stats()['spilled'] > 0
+
+    db.up = True
+    assert wait_for(lambda: len(db.rows) == len(rows))
+    writer.close()
+    assert set(db.rows) == {row['uuid'] for row in rows}
+
+@pytest.mark.parametrize('replays', [1, 2])
+def test_spill_file_is_replayed_when_the_writer_starts(tmp_path, replays):
+    db = StubDatabase()
+    rows = [make_row() for _ in range(5)]
+    with open(tmp_path / 'pending.jsonl', 'w', encoding='utf-8') as f:
+        for _ in range(replays):
+            # A second copy stands for rows written before an interrupted replay
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+
+    writer = make_writer(db, tmp_path)
+    writer.start()
+    assert wait_for(lambda: len(db.rows) == len(rows))
+    writer.close()
+    assert not (tmp_path / 'pending.jsonl').exists()
+
+def test_close_with_a_full_queue_and_no_database_spills_instead_of_blocking(tmp_path):
+    db = StubDatabase()
+    db.up = False
+    writer = make_writer(db, tmp_path, max_queue=3, batch_size=1)
+    rows = [make_row() for _ in range(10)]
+    for row in rows:
+        writer.enqueue(row)
+
+    started = time.monotonic()
+    writer.close(timeout=10)
+    assert time.monotonic() - started < 5
+    assert not writer._thread.is_alive()
+    assert {row['uuid'] for row in read_jsonl(tmp_path / 'pending.jsonl')} == {row['uuid'] for row in rows}
+
+def test_claimed_files_left_by_a_dead_worker_are_replayed(tmp_path):
+    db = StubDatabase()
+    rows = [make_row() for _ in range(5)]
+    with open(tmp_path / 'pending.jsonl.3f2a.claimed', 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+    db.rows[rows[0]['uuid']] = 1
+
+    writer = make_writer(db, tmp_path)
+    writer.start()
+    assert wait_for(lambda: len(db.rows) == len(rows))
+    writer.close()
+    assert list(tmp_path.glob('*.claimed')) == []